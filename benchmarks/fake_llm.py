@@ -0,0 +1,75 @@
+"""
+A stand-in for the Anthropic Messages API, for benchmarking the search
+endpoint without network calls or model variance.
+
+It answers POST /v1/messages after a fixed latency (plus optional jitter)
+with canned SQL picked from the question, so the SQL and result caches see
+as many distinct queries as the load test asks distinct questions. Point the
+server at it with ANTHROPIC_BASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/fake_llm.py --port 8766 --latency 0.8
+"""
+import re
+import random
+import asyncio
+import argparse
+import itertools
+import uvicorn
+from fastapi import FastAPI, Request
+
+YEAR_SQL = ("SELECT CompanyName, CompanyNumber, IncorporationDate FROM companies "
+            "WHERE IncorporationDate BETWEEN '{year}-01-01' AND '{year}-12-31' ORDER BY IncorporationDate LIMIT 20")
+DISSOLVED_SQL = ("SELECT CompanyName, CompanyNumber, DissolutionDate FROM companies "
+                 "WHERE DissolutionDate IS NOT NULL ORDER BY DissolutionDate DESC LIMIT 20")
+DEFAULT_SQL = "SELECT CompanyName, CompanyNumber, CompanyStatus FROM companies WHERE CompanyStatus = 'Active'"
+
+
+def canned_sql(question):
+    """The SQL the fake model 'generates' for a question."""
+    year = re.search(r'\b(19|20)\d\d\b', question)
+    if year:
+        return YEAR_SQL.format(year=year.group())
+    if 'dissolved' in question.lower():
+        return DISSOLVED_SQL
+    return DEFAULT_SQL
+
+
+def create_app(latency=0.5, jitter=0.0):
+    app = FastAPI()
+    ids = itertools.count(1)
+    app.state.calls = 0
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        question = body["messages"][-1]["content"]
+        if isinstance(question, list):
+            question = " ".join(part.get("text", "") for part in question)
+        return {
+            "id": f"msg_bench_{next(ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": canned_sql(question)}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 0, "output_tokens": 0},
+        }
+
+    @app.get("/calls")
+    async def calls():
+        return {"calls": app.state.calls}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve a fake Anthropic Messages API for benchmarks.')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds per model call.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- seconds added to the latency.')
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.jitter), host=args.host, port=args.port, log_level="warning")
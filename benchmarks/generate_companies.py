@@ -0,0 +1,274 @@
+"""
+Generates a synthetic Companies House "BasicCompanyData" snapshot.
+
+The columns follow the companies DDL in sql/ and the header uses the same
+dotted names as the real download (e.g. 'RegAddress.PostTown'), so the files
+go through the normal import path. Value distributions are skewed the way the
+real register is: mostly active private limited companies, micro-entity
+accounts, a long tail of counties and SIC codes, and incorporation dates
+weighted towards recent years. Dates are laid out around --today, so queries
+relative to date('now') find rows; output is deterministic for a given seed
+and --today.
+
+    python benchmarks/generate_companies.py --rows 1000000 --output benchmarks/data/companies.zip
+"""
+import os
+import io
+import sys
+import csv
+import time
+import random
+import zipfile
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_to_db import load_schema, clean_column_name  # noqa: E402
+
+# Prefixes the real CSV separates from the field name with a dot.
+HEADER_PREFIXES = ('RegAddress', 'Accounts', 'Returns', 'Mortgages', 'SICCode', 'LimitedPartnerships')
+
+STATUSES = [('Active', 900), ('Active - Proposal to Strike off', 40), ('Liquidation', 25),
+            ('In Administration', 4), ('Voluntary Arrangement', 2), ('Dissolved', 25), ('Live but Receiver Manager on at least one charge', 1),
+            ('RECEIVERSHIP', 1), ('Administrative Receiver', 1), ('Voluntary Arrangement / Administrative Receiver', 1)]
+CATEGORIES = [('Private Limited Company', 930), ("PRI/LBG/NSC (Private, Limited by guarantee, no share capital, use of 'Limited' exemption)", 20),
+              ('Limited Liability Partnership', 15), ('Community Interest Company', 10), ('Charitable Incorporated Organisation', 8),
+              ('Private Limited by Shares', 5), ('Public Limited Company', 3), ('Limited Partnership', 5),
+              ('Private Unlimited Company', 2), ('Investment Company with Variable Capital', 1), ('Scottish Partnership', 1)]
+ACCOUNT_CATEGORIES = [('MICRO ENTITY', 450), ('TOTAL EXEMPTION FULL', 140), ('NO ACCOUNTS FILED', 150), ('DORMANT', 100),
+                      ('UNAUDITED ABRIDGED', 70), ('SMALL', 40), ('FULL', 25), ('GROUP', 10), ('TOTAL EXEMPTION SMALL', 5),
+                      ('AUDIT EXEMPTION SUBSIDIARY', 5), ('ACCOUNTS TYPE NOT AVAILABLE', 3), ('MEDIUM', 2)]
+# (county, post town, postcode area), most populous first; weights follow a Zipf curve.
+PLACES = [('Greater London', 'LONDON', 'EC1'), ('West Midlands', 'BIRMINGHAM', 'B'), ('Greater Manchester', 'MANCHESTER', 'M'),
+          ('West Yorkshire', 'LEEDS', 'LS'), ('Kent', 'MAIDSTONE', 'ME'), ('Essex', 'CHELMSFORD', 'CM'),
+          ('Merseyside', 'LIVERPOOL', 'L'), ('South Yorkshire', 'SHEFFIELD', 'S'), ('Hampshire', 'SOUTHAMPTON', 'SO'),
+          ('Lancashire', 'PRESTON', 'PR'), ('Surrey', 'GUILDFORD', 'GU'), ('Hertfordshire', 'ST ALBANS', 'AL'),
+          ('Tyne and Wear', 'NEWCASTLE UPON TYNE', 'NE'), ('Bristol', 'BRISTOL', 'BS'), ('Nottinghamshire', 'NOTTINGHAM', 'NG'),
+          ('Leicestershire', 'LEICESTER', 'LE'), ('Devon', 'EXETER', 'EX'), ('Norfolk', 'NORWICH', 'NR'),
+          ('Suffolk', 'IPSWICH', 'IP'), ('Cheshire', 'CHESTER', 'CH'), ('Derbyshire', 'DERBY', 'DE'),
+          ('Staffordshire', 'STOKE-ON-TRENT', 'ST'), ('Oxfordshire', 'OXFORD', 'OX'), ('Cambridgeshire', 'CAMBRIDGE', 'CB'),
+          ('Berkshire', 'READING', 'RG'), ('Buckinghamshire', 'MILTON KEYNES', 'MK'), ('Cardiff', 'CARDIFF', 'CF'),
+          ('Midlothian', 'EDINBURGH', 'EH'), ('Lanarkshire', 'GLASGOW', 'G'), ('County Antrim', 'BELFAST', 'BT'),
+          ('Dorset', 'BOURNEMOUTH', 'BH'), ('Somerset', 'TAUNTON', 'TA'), ('Cornwall', 'TRURO', 'TR'),
+          ('Lincolnshire', 'LINCOLN', 'LN'), ('Northamptonshire', 'NORTHAMPTON', 'NN'), ('Wiltshire', 'SWINDON', 'SN'),
+          ('Gloucestershire', 'GLOUCESTER', 'GL'), ('North Yorkshire', 'YORK', 'YO'), ('East Sussex', 'BRIGHTON', 'BN'),
+          ('West Sussex', 'CRAWLEY', 'RH'), ('Cumbria', 'CARLISLE', 'CA'), ('Shropshire', 'SHREWSBURY', 'SY'),
+          ('Herefordshire', 'HEREFORD', 'HR'), ('Worcestershire', 'WORCESTER', 'WR'), ('Durham', 'DURHAM', 'DH')]
+# Share of rows with the county left blank, which is common in the register.
+BLANK_COUNTY_SHARE = 0.45
+SIC_CODES = [('82990', 'Other business support service activities n.e.c.'),
+             ('70229', 'Management consultancy activities other than financial management'),
+             ('68209', 'Other letting and operating of own or leased real estate'),
+             ('96090', 'Other service activities n.e.c.'), ('62020', 'Information technology consultancy activities'),
+             ('68100', 'Buying and selling of own real estate'), ('43290', 'Other construction installation'),
+             ('47910', 'Retail sale via mail order houses or via Internet'), ('56101', 'Licensed restaurants'),
+             ('41100', 'Development of building projects'), ('43220', 'Plumbing, heat and air-conditioning installation'),
+             ('99999', 'Dormant Company'), ('49410', 'Freight transport by road'),
+             ('86900', 'Other human health activities'), ('74909', 'Other professional, scientific and technical activities n.e.c.'),
+             ('64209', 'Activities of other holding companies n.e.c.'), ('62090', 'Other information technology service activities'),
+             ('73110', 'Advertising agencies'), ('85600', 'Educational support services'), ('01110', 'Growing of cereals'),
+             ('45112', 'Sale of used cars and light motor vehicles'), ('93130', 'Fitness facilities'),
+             ('56302', 'Public houses and bars'), ('81210', 'General cleaning of buildings'), ('43390', 'Other building completion and finishing')]
+NAME_WORDS = ['ACME', 'ALPHA', 'APEX', 'ATLAS', 'BLUE', 'BRIGHT', 'CASTLE', 'CEDAR', 'CITY', 'CORE', 'CROWN', 'DELTA',
+              'EAGLE', 'EDGE', 'FIRST', 'FOX', 'GOLD', 'GREEN', 'HARBOUR', 'HIGH', 'KING', 'LINK', 'MAPLE', 'METRO',
+              'NORTH', 'OAK', 'PEAK', 'PRIME', 'QUANTUM', 'RED', 'RIVER', 'ROYAL', 'SILVER', 'SMART', 'SOUTH', 'STAR',
+              'SUMMIT', 'TOWER', 'UNITED', 'VALLEY', 'VISION', 'WEST', 'WILLOW']
+NAME_TRADES = ['BUILDERS', 'CONSULTING', 'DIGITAL', 'ESTATES', 'FOODS', 'HOLDINGS', 'INVESTMENTS', 'LOGISTICS',
+               'MEDIA', 'PLUMBING', 'PROPERTIES', 'SERVICES', 'SOLUTIONS', 'SYSTEMS', 'TECHNOLOGIES', 'TRADING',
+               'TRAVEL', 'VENTURES']
+STREETS = ['HIGH STREET', 'STATION ROAD', 'CHURCH LANE', 'MILL LANE', 'PARK ROAD', 'VICTORIA ROAD', 'GREEN LANE',
+           'MANOR ROAD', 'KINGS ROAD', 'QUEENS ROAD', 'NEW ROAD', 'LONDON ROAD']
+# Company number prefixes: England & Wales (none), Scotland, Northern Ireland, LLPs.
+NUMBER_PREFIXES = [('', 900), ('SC', 60), ('NI', 20), ('OC', 20)]
+
+
+def csv_header(schema):
+    """The snapshot header for the schema, e.g. 'RegAddressPostTown' -> 'RegAddress.PostTown'."""
+    header = []
+    for name, _ in schema:
+        field = name
+        for prefix in HEADER_PREFIXES:
+            if name.startswith(prefix) and name != prefix:
+                field = f"{prefix}.{name[len(prefix):]}"
+                break
+        if name.startswith('PreviousName_'):
+            number, _, rest = name[len('PreviousName_'):].partition('C')
+            field = f" PreviousName_{number}.C{rest}"
+        header.append(field)
+    assert [clean_column_name(field) for field in header] == [name for name, _ in schema]
+    return header
+
+
+def _weighted(pairs):
+    values, weights = zip(*pairs)
+    total = sum(weights)
+    cumulative, running = [], 0
+    for weight in weights:
+        running += weight
+        cumulative.append(running / total)
+    return list(values), cumulative
+
+
+def _uk_date(day):
+    return day.strftime('%d/%m/%Y')
+
+
+class CompanyGenerator:
+    """Produces synthetic snapshot rows in schema column order."""
+
+    def __init__(self, seed=0, today=None):
+        self.rng = random.Random(seed)
+        self.today = today or date.today()
+        _, self.schema = load_schema()
+        self.columns = [name for name, _ in self.schema]
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self.statuses = _weighted(STATUSES)
+        self.categories = _weighted(CATEGORIES)
+        self.account_categories = _weighted(ACCOUNT_CATEGORIES)
+        self.prefixes = _weighted(NUMBER_PREFIXES)
+        self.places = _weighted([(place, 1 / rank) for rank, place in enumerate(PLACES, 1)])
+        self.sic_codes = _weighted([(f"{code} - {text}", 1 / rank ** 0.8) for rank, (code, text) in enumerate(SIC_CODES, 1)])
+
+    def _pick(self, weighted):
+        values, cumulative = weighted
+        return self.rng.choices(values, cum_weights=cumulative)[0]
+
+    def _name(self):
+        rng = self.rng
+        words = [rng.choice(NAME_WORDS)]
+        if rng.random() < 0.7:
+            words.append(rng.choice(NAME_TRADES))
+        return ' '.join(words) + rng.choice([' LTD', ' LIMITED', ' LIMITED', ' LLP', ' UK LTD'])
+
+    def row(self, sequence):
+        rng, today = self.rng, self.today
+        row = [''] * len(self.columns)
+
+        def put(column, value):
+            row[self.index[column]] = value
+
+        prefix = self._pick(self.prefixes)
+        number = f"{prefix}{sequence:0{8 - len(prefix)}d}"
+        put('CompanyNumber', number)
+        put('CompanyName', f"{self._name()} {sequence}" if rng.random() < 0.3 else self._name())
+        county, town, area = self._pick(self.places)
+        put('RegAddressAddressLine1', f"{rng.randint(1, 250)} {rng.choice(STREETS)}")
+        if rng.random() < 0.3:
+            put('RegAddressAddressLine2', f"UNIT {rng.randint(1, 40)}")
+        put('RegAddressPostTown', town)
+        if rng.random() >= BLANK_COUNTY_SHARE:
+            put('RegAddressCounty', county if rng.random() < 0.8 else county.upper())
+        put('RegAddressCountry', 'UNITED KINGDOM' if rng.random() < 0.5 else 'ENGLAND')
+        put('RegAddressPostCode', f"{area}{rng.randint(1, 20)} {rng.randint(1, 9)}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}"
+                                  f"{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}")
+        put('CompanyCategory', self._pick(self.categories))
+        status = self._pick(self.statuses)
+        put('CompanyStatus', status)
+        put('CountryOfOrigin', 'United Kingdom')
+
+        # Incorporations weighted towards recent years, as in the live register.
+        incorporated = today - timedelta(days=int(rng.expovariate(1 / 2500)) + 1)
+        put('IncorporationDate', _uk_date(incorporated))
+        if status == 'Dissolved':
+            put('DissolutionDate', _uk_date(incorporated + timedelta(days=rng.randint(365, max(366, (today - incorporated).days)))))
+        ref_month = rng.choice([3, 12, 12, 12]) if rng.random() < 0.5 else rng.randint(1, 12)
+        put('AccountsAccountRefDay', str(rng.choice([28, 30, 31])))
+        put('AccountsAccountRefMonth', str(ref_month))
+        category = self._pick(self.account_categories)
+        put('AccountsAccountCategory', category)
+        next_due = today + timedelta(days=rng.randint(-60, 365))
+        put('AccountsNextDueDate', _uk_date(next_due))
+        if category != 'NO ACCOUNTS FILED':
+            put('AccountsLastMadeUpDate', _uk_date(next_due - timedelta(days=rng.randint(270, 640))))
+        if rng.random() < 0.05:
+            put('ReturnsNextDueDate', _uk_date(incorporated + timedelta(days=rng.randint(365, 3000))))
+        mortgages = rng.choices([0, 1, 2, 5], cum_weights=[0.85, 0.95, 0.99, 1.0])[0]
+        satisfied = rng.randint(0, mortgages)
+        put('MortgagesNumMortCharges', str(mortgages))
+        put('MortgagesNumMortOutstanding', str(mortgages - satisfied))
+        put('MortgagesNumMortPartSatisfied', '0')
+        put('MortgagesNumMortSatisfied', str(satisfied))
+
+        codes = rng.choices([1, 2, 3, 4], cum_weights=[0.75, 0.92, 0.98, 1.0])[0]
+        for n, sic in enumerate(dict.fromkeys(self._pick(self.sic_codes) for _ in range(codes)), 1):
+            put(f'SICCodeSicText_{n}', sic)
+        if row[self.index['SICCodeSicText_1']] == '' or rng.random() < 0.02:
+            put('SICCodeSicText_1', 'None Supplied')
+        put('LimitedPartnershipsNumGenPartners', '0')
+        put('LimitedPartnershipsNumLimPartners', '0')
+        put('URI', f"http://business.data.gov.uk/id/company/{number}")
+
+        changed = incorporated
+        for n in range(1, rng.choices([1, 2, 3, 4], cum_weights=[0.88, 0.96, 0.99, 1.0])[0]):
+            changed = changed + timedelta(days=rng.randint(30, 1500))
+            if changed >= today:
+                break
+            put(f'PreviousName_{n}CONDATE', _uk_date(changed))
+            put(f'PreviousName_{n}CompanyName', self._name())
+
+        conf_due = today + timedelta(days=rng.randint(-30, 365))
+        put('ConfStmtNextDueDate', _uk_date(conf_due))
+        put('ConfStmtLastMadeUpDate', _uk_date(conf_due - timedelta(days=379)))
+        return row
+
+
+def generate(rows, output, parts=1, seed=0, today=None):
+    """
+    Writes `rows` synthetic companies to `output`, split into `parts` files.
+
+    A '.zip' output holds one CSV member per file, as the real download does.
+    With several parts, files are named like the snapshot parts, e.g.
+    companies-part1_of_4.zip. Rows are streamed, so memory use does not grow
+    with the row count. Dates are laid out around `today` (default: the
+    current date).
+
+    Returns:
+        list[str]: The files written.
+    """
+    generator = CompanyGenerator(seed, today)
+    header = csv_header(generator.schema)
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    stem, extension = os.path.splitext(os.path.basename(output))
+
+    paths = []
+    per_part = -(-rows // parts)
+    for part in range(parts):
+        name = f"{stem}-part{part + 1}_of_{parts}{extension}" if parts > 1 else f"{stem}{extension}"
+        path = os.path.join(directory, name)
+        start, stop = part * per_part, min(rows, (part + 1) * per_part)
+        if extension == '.zip':
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive, \
+                    archive.open(os.path.splitext(name)[0] + '.csv', 'w', force_zip64=True) as member, \
+                    io.TextIOWrapper(member, encoding='utf-8', newline='') as handle:
+                _write_rows(handle, header, generator, start, stop)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as handle:
+                _write_rows(handle, header, generator, start, stop)
+        paths.append(path)
+    return paths
+
+
+def _write_rows(handle, header, generator, start, stop):
+    writer = csv.writer(handle)
+    writer.writerow(header)
+    for sequence in range(start, stop):
+        writer.writerow(generator.row(sequence + 1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic Companies House snapshot.')
+    parser.add_argument('--rows', type=int, default=100000, help='Number of companies (10k to 10M).')
+    parser.add_argument('--output', type=str, default='benchmarks/data/companies.csv',
+                        help='Output .csv or .zip path.')
+    parser.add_argument('--parts', type=int, default=1, help='Split the snapshot into this many files.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='Date (YYYY-MM-DD) that due and incorporation dates are laid out around.')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = generate(args.rows, args.output, args.parts, args.seed, args.today)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.rows:,} companies to {', '.join(written)} in {elapsed:.1f}s "
+          f"({args.rows / max(elapsed, 1e-9):,.0f} rows/sec)")
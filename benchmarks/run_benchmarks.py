@@ -0,0 +1,395 @@
+"""
+Reproducible benchmarks for the import, query and search paths.
+
+One run generates (or reuses) a synthetic snapshot, then times:
+
+  - ingest: csv_to_sqlite followed by create_indexes, and a versioned
+    bulk_load published with import_build,
+  - queries: every SqlQuery canned query against the loaded database,
+  - search: a concurrent load test of /api/companies/search, served by
+    mcp_server under uvicorn with a fake LLM (benchmarks/fake_llm.py).
+
+Results are written as JSON with the environment they were measured in, and
+can be compared against an earlier run with --baseline.
+
+    python benchmarks/run_benchmarks.py --rows 100000
+    python benchmarks/run_benchmarks.py --rows 100000 --baseline benchmarks/results/<earlier>.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import socket
+import random
+import shutil
+import sqlite3
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import contextlib
+from datetime import date, datetime, timezone
+
+import httpx
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from file_to_db import (DB_PATH, SqlQuery, csv_to_sqlite, create_indexes, bulk_load, import_build,  # noqa: E402
+                        query_companies_table, fts_match_expression)
+from sql_guard import GuardError  # noqa: E402
+from generate_companies import generate  # noqa: E402
+
+# Bound values for the canned queries that take parameters.
+QUERY_PARAMS = {
+    SqlQuery.FTS_SEARCH: (fts_match_expression('green'), 20),
+}
+# Questions the intent matcher answers from templates and count tables.
+TEMPLATE_QUESTIONS = [
+    "active companies in suffolk",
+    "companies in liquidation",
+    "micro entity companies",
+    "dormant companies in kent",
+    "active companies with accounts due next month",
+    "how many companies are in liquidation",
+    "how many micro entity companies are there",
+    "companies by county",
+]
+# Questions that need the (fake) model; each year is a distinct SQL cache entry.
+LLM_QUESTIONS = [f"which companies were incorporated in {year}" for year in range(1995, 2025)]
+SERVER_API_KEY = "benchmark"
+
+
+def summarize(samples):
+    """Latency summary in seconds: count, mean, min, max and nearest-rank percentiles."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))]
+
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'min': ordered[0],
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'max': ordered[-1],
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+@contextlib.contextmanager
+def quiet(verbose):
+    """Hides the progress output of the import functions unless verbose."""
+    if verbose:
+        yield
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def snapshot_paths(workdir, rows, parts, seed, today):
+    """Generates the snapshot unless a matching one is already in `workdir`."""
+    output = os.path.join(workdir, f"companies-{rows}-seed{seed}-{today.isoformat()}.zip")
+    stem = os.path.splitext(output)[0]
+    expected = [f"{stem}-part{n}_of_{parts}.zip" for n in range(1, parts + 1)] if parts > 1 else [output]
+    if all(os.path.exists(path) for path in expected):
+        return expected, None
+    paths, seconds = timed(generate, rows, output, parts, seed, today)
+    return paths, seconds
+
+
+def bench_ingest(paths, workdir, rows, workers, verbose):
+    """Times the pandas import path and the versioned bulk load; returns the results and the live DB path."""
+    results = {}
+    scratch = os.path.join(workdir, 'ingest')
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+    pandas_db = os.path.join(scratch, 'pandas.db')
+    with quiet(verbose):
+        _, seconds = timed(csv_to_sqlite, paths, 'companies', db_path=pandas_db)
+    results['csv_to_sqlite'] = {'seconds': seconds, 'rows_per_sec': rows / seconds}
+    with quiet(verbose):
+        _, seconds = timed(create_indexes, pandas_db)
+    results['create_indexes'] = {'seconds': seconds}
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    # The search benchmark serves this database, at the path mcp_server uses relative to its cwd.
+    live_db = os.path.join(workdir, DB_PATH)
+    shutil.rmtree(os.path.dirname(live_db), ignore_errors=True)
+    with quiet(verbose):
+        loaded, seconds = timed(import_build, lambda path: bulk_load(paths, path, workers=workers), live_db)
+    if not loaded:
+        raise RuntimeError("bulk_load did not publish a build; rerun with --verbose for details")
+    results['bulk_load'] = {'seconds': seconds, 'rows_per_sec': rows / seconds, 'workers': workers,
+                            'db_bytes': os.path.getsize(os.path.realpath(live_db))}
+    return results, live_db
+
+
+def bench_queries(db_path, repeat):
+    """Times each canned query: one warm-up run, then `repeat` measured runs."""
+    results = {}
+    for query in SqlQuery:
+        params = QUERY_PARAMS.get(query)
+        try:
+            frame = query_companies_table(query.value, return_json=False, params=params, db_path=db_path)
+        except GuardError as e:
+            results[query.name] = {'skipped': e.reason}
+            continue
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query_companies_table(query.value, return_json=False, params=params, db_path=db_path)
+            samples.append(time.perf_counter() - started)
+        results[query.name] = {'rows': len(frame), **summarize(samples)}
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+@contextlib.contextmanager
+def serve(args, url, cwd, env, verbose):
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen(args, cwd=cwd, env=env, stdout=output, stderr=output)
+    try:
+        wait_for(url, process)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _server_timing(header):
+    """Parses 'llm;dur=812.4, sql;dur=3.1' into {'llm': 0.8124, 'sql': 0.0031}."""
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or '').split(','))):
+        name, _, duration = entry.partition(';dur=')
+        if duration:
+            stages[name] = stages.get(name, 0.0) + float(duration) / 1000
+    return stages
+
+
+async def _load(base_url, questions, concurrency, page_size):
+    queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+    records = []
+
+    async def worker(client):
+        while not queue.empty():
+            question = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.get("/api/companies/search", params={'query': question, 'limit': page_size},
+                                            headers={'X-API-Key': SERVER_API_KEY})
+                ok = response.status_code == 200 and 'error' not in (response.json().get('result') or {})
+                records.append({'seconds': time.perf_counter() - started, 'status': response.status_code, 'ok': ok,
+                                'served_by': response.headers.get('x-served-by', 'none'),
+                                'stages': _server_timing(response.headers.get('server-timing'))})
+            except httpx.HTTPError as e:
+                records.append({'seconds': time.perf_counter() - started, 'status': type(e).__name__, 'ok': False,
+                                'served_by': 'none', 'stages': {}})
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return records, elapsed
+
+
+def bench_search(workdir, requests, concurrency, llm_latency, llm_share, page_size, seed, verbose):
+    """
+    Load-tests /api/companies/search. Questions are a seeded mix of template
+    questions and model questions (`llm_share` of the requests); repeats of a
+    question exercise the caches as real traffic would.
+    """
+    rng = random.Random(seed)
+    questions = [rng.choice(LLM_QUESTIONS) if rng.random() < llm_share else rng.choice(TEMPLATE_QUESTIONS)
+                 for _ in range(requests)]
+
+    llm_port, server_port = free_port(), free_port()
+    llm_url, server_url = f"http://127.0.0.1:{llm_port}", f"http://127.0.0.1:{server_port}"
+    env = {**os.environ, 'ANTHROPIC_API_KEY': SERVER_API_KEY, 'ANTHROPIC_BASE_URL': llm_url,
+           'PYTHONPATH': os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')]))}
+    fake_llm = [sys.executable, os.path.join(BENCHMARKS_DIR, 'fake_llm.py'), '--port', str(llm_port),
+                '--latency', str(llm_latency)]
+    server = [sys.executable, '-m', 'uvicorn', 'mcp_server:app', '--host', '127.0.0.1', '--port', str(server_port),
+              '--log-level', 'warning']
+
+    with serve(fake_llm, f"{llm_url}/calls", workdir, env, verbose), \
+            serve(server, f"{server_url}/metrics", workdir, env, verbose):
+        records, elapsed = asyncio.run(_load(server_url, questions, concurrency, page_size))
+        llm_calls = httpx.get(f"{llm_url}/calls").json()['calls']
+        cache_stats = httpx.get(f"{server_url}/api/cache/stats").json()
+
+    by_path = {}
+    for record in records:
+        by_path.setdefault(record['served_by'], []).append(record['seconds'])
+    stage_samples = {}
+    for record in records:
+        for stage, seconds in record['stages'].items():
+            stage_samples.setdefault(stage, []).append(seconds)
+    statuses = {}
+    for record in records:
+        statuses[str(record['status'])] = statuses.get(str(record['status']), 0) + 1
+
+    return {
+        'requests': len(records),
+        'concurrency': concurrency,
+        'llm_latency': llm_latency,
+        'llm_share': llm_share,
+        'seconds': elapsed,
+        'requests_per_sec': len(records) / elapsed,
+        'failed': sum(not record['ok'] for record in records),
+        'statuses': statuses,
+        'latency': summarize([record['seconds'] for record in records]),
+        'latency_by_served_by': {path: summarize(samples) for path, samples in sorted(by_path.items())},
+        'server_stages': {stage: summarize(samples) for stage, samples in sorted(stage_samples.items())},
+        'llm_calls': llm_calls,
+        'cache_stats': cache_stats,
+    }
+
+
+def flatten(results, prefix=''):
+    """Timing figures keyed by path, e.g. 'queries.MICRO_ENTITY.p50'."""
+    figures = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            figures.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and key in ('seconds', 'rows_per_sec', 'requests_per_sec',
+                                                         'mean', 'p50', 'p95', 'p99'):
+            figures[path] = value
+    return figures
+
+
+def compare(results, baseline):
+    """Prints each timing figure next to the baseline's, with the ratio."""
+    current, previous = flatten(results), flatten(baseline)
+    print(f"\n{'figure':<60} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for path in sorted(current.keys() & previous.keys()):
+        if path.startswith(('search.cache_stats', 'meta')):
+            continue
+        ratio = current[path] / previous[path] if previous[path] else float('nan')
+        print(f"{path:<60} {previous[path]:>12.4f} {current[path]:>12.4f} {ratio:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the import, query and search benchmarks.')
+    parser.add_argument('--rows', type=int, default=100000, help='Synthetic companies to generate (10k to 10M).')
+    parser.add_argument('--parts', type=int, default=1, help='Split the snapshot into this many zip files.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the data and the load test question mix.')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='Date (YYYY-MM-DD) the synthetic dates are laid out around; fix it to rerun on the same data.')
+    parser.add_argument('--workers', type=int, default=1, help='Parse processes for bulk_load.')
+    parser.add_argument('--repeat', type=int, default=20, help='Measured runs per canned query.')
+    parser.add_argument('--requests', type=int, default=500, help='Search requests in the load test.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent search clients.')
+    parser.add_argument('--llm_latency', type=float, default=0.5, help='Seconds per fake model call.')
+    parser.add_argument('--llm_share', type=float, default=0.3, help='Share of search requests needing the model.')
+    parser.add_argument('--page_size', type=int, default=20, help='limit sent with each search request.')
+    parser.add_argument('--skip', choices=['ingest', 'queries', 'search'], action='append', default=[],
+                        help='Skip a stage; ingest can only be skipped once a database exists.')
+    parser.add_argument('--workdir', type=str, default=os.path.join(BENCHMARKS_DIR, 'data'),
+                        help='Where the snapshot and benchmark database are kept.')
+    parser.add_argument('--output', type=str, help='Results file (default benchmarks/results/<timestamp>.json).')
+    parser.add_argument('--baseline', type=str, help='Earlier results file to compare against.')
+    parser.add_argument('--verbose', action='store_true', help='Show import and server output.')
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(workdir, exist_ok=True)
+    results = {'meta': {**environment(), 'rows': args.rows, 'parts': args.parts, 'seed': args.seed,
+                        'today': args.today.isoformat()}}
+
+    paths, seconds = snapshot_paths(workdir, args.rows, args.parts, args.seed, args.today)
+    if seconds is not None:
+        results['generate'] = {'seconds': seconds, 'rows_per_sec': args.rows / seconds}
+        print(f"Generated {args.rows:,} companies in {seconds:.1f}s")
+
+    live_db = os.path.join(workdir, DB_PATH)
+    if 'ingest' not in args.skip:
+        results['ingest'], live_db = bench_ingest(paths, workdir, args.rows, args.workers, args.verbose)
+        for name, figures in results['ingest'].items():
+            print(f"ingest {name}: {figures['seconds']:.2f}s")
+    elif not os.path.exists(live_db):
+        parser.error(f"--skip ingest needs an existing database at {live_db}")
+
+    if 'queries' not in args.skip:
+        results['queries'] = bench_queries(live_db, args.repeat)
+        for name, figures in results['queries'].items():
+            summary = f"skipped ({figures['skipped']})" if 'skipped' in figures else \
+                f"p50 {figures['p50'] * 1000:.2f}ms, p95 {figures['p95'] * 1000:.2f}ms, {figures['rows']} rows"
+            print(f"query {name}: {summary}")
+
+    if 'search' not in args.skip:
+        results['search'] = bench_search(workdir, args.requests, args.concurrency, args.llm_latency,
+                                         args.llm_share, args.page_size, args.seed, args.verbose)
+        search = results['search']
+        print(f"search: {search['requests_per_sec']:.1f} req/s, p50 {search['latency']['p50'] * 1000:.1f}ms, "
+              f"p99 {search['latency']['p99'] * 1000:.1f}ms, {search['failed']} failed, "
+              f"{search['llm_calls']} model calls")
+
+    output = args.output or os.path.join(
+        BENCHMARKS_DIR, 'results', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{args.rows}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import queue
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", min(8, (os.cpu_count() or 1) + 2)))
+
+# Applied to every pooled connection. query_only guards against writes even if
+# a statement slips past the SELECT check; mmap lets readers share the OS page cache.
+READ_PRAGMAS = {
+    'query_only': 1,
+    'mmap_size': 1024 * 1024 * 1024,
+    'cache_size': -65536,  # 64 MB per connection
+    'busy_timeout': 30000,  # 30 seconds
+    'temp_store': 'MEMORY',
+}
+
+
+def ensure_wal(db_path):
+    """
+    Switches the database to WAL journaling so readers never block on, or are
+    blocked by, a writer. The setting is persistent, so this is a no-op after
+    the first call.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute('PRAGMA journal_mode').fetchone()[0].lower() != 'wal':
+            conn.execute('PRAGMA journal_mode = WAL')
+    finally:
+        conn.close()
+
+
+class ConnectionPool:
+    """
+    A bounded set of read-only SQLite connections shared between threads.
+
+    Connections are opened lazily up to `size` and handed out one caller at a
+    time; when all are busy, callers wait for one to be returned. The pool never
+    writes to the database, not even to switch it to WAL: imports do that
+    before they publish a build.
+
+    Raises:
+        FileNotFoundError: If the database does not exist yet.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, pragmas=None):
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = READ_PRAGMAS if pragmas is None else pragmas
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        # A read-write connect would create an empty database before the first import.
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Database not found at {db_path}")
+
+    def _connect(self):
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {timeout}s") from None
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout=30):
+        """
+        Borrows a connection for the duration of the with-block.
+
+        Args:
+            timeout (float): Seconds to wait for a free connection.
+
+        Raises:
+            TimeoutError: If no connection frees up in time.
+        """
+        conn = self._acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """Closes idle connections now and busy ones as they are returned."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Sized like the pool so threads never queue for a connection they cannot get.
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='sqlite-query')
+
+
+def get_pool(db_path):
+    """
+    Returns the shared pool for `db_path`, creating it on first use.
+
+    `db_path` may be a symlink to the current versioned build. When the link
+    has been switched to a new build, a fresh pool is opened on it and the old
+    pool is drained: its idle connections close now, and connections still
+    running a query close as they are returned.
+    """
+    key = os.path.abspath(db_path)
+    target = os.path.realpath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.db_path != target:
+            logger.info("%s now points to %s, draining connections to %s", key, target, pool.db_path)
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(target)
+        return pool
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """Runs a blocking database call on the bounded query thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
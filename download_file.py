@@ -1,18 +1,66 @@
-
 import os
+import json
+import time
+import shutil
 import requests
 import zipfile
 import argparse
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
-def download_and_unzip(url, output_dir='.'):
+CHUNK_SIZE = 1024 * 1024
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+REQUEST_TIMEOUT = 60
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of a single download in a batch."""
+    url: str
+    path: str
+    bytes_downloaded: int
+    seconds: float
+    skipped: bool = False
+
+    @property
+    def throughput_mb_s(self):
+        if self.seconds <= 0:
+            return 0.0
+        return self.bytes_downloaded / self.seconds / (1024 * 1024)
+
+
+def _filename_from_url(url):
+    filename = os.path.basename(urlparse(url).path)
+    return filename or "downloaded_file"
+
+
+def _extract_zip(file_path, output_dir):
+    """Extracts a zip file next to itself and removes the archive."""
+    filename = os.path.basename(file_path)
+    print(f"{filename} is a zip file. Extracting...")
+    extract_dir = os.path.join(output_dir, os.path.splitext(filename)[0])
+    if not os.path.exists(extract_dir):
+        os.makedirs(extract_dir)
+
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        zip_ref.extractall(extract_dir)
+
+    print(f"Extracted to {extract_dir}")
+    os.remove(file_path) # remove the original zip file
+    return extract_dir
+
+
+def download_and_unzip(url, output_dir='.', unzip=True):
     """
-    Downloads a file from a URL, unzips it if it's a zip file, 
+    Downloads a file from a URL, unzips it if it's a zip file,
     and saves it to the specified directory.
 
     Args:
         url (str): The URL of the file to download.
         output_dir (str): The directory to save the file in.
+        unzip (bool): Extract zip files. Pass False to keep the archive,
+            which file_to_db can import directly.
 
     Returns:
         str: The path to the downloaded file or the directory where it was extracted.
@@ -25,33 +73,19 @@ def download_and_unzip(url, output_dir='.'):
         response.raise_for_status()  # Raise an exception for bad status codes
 
         # Get filename from URL
-        parsed_url = urlparse(url)
-        filename = os.path.basename(parsed_url.path)
-        if not filename:
-            filename = "downloaded_file"
-            
+        filename = _filename_from_url(url)
         file_path = os.path.join(output_dir, filename)
 
         print(f"Downloading {filename} to {file_path}...")
         with open(file_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
                 f.write(chunk)
-        
+
         print("Download complete.")
 
         # Check if the file is a zip file and unzip it
-        if zipfile.is_zipfile(file_path):
-            print(f"{filename} is a zip file. Extracting...")
-            extract_dir = os.path.join(output_dir, os.path.splitext(filename)[0])
-            if not os.path.exists(extract_dir):
-                os.makedirs(extract_dir)
-            
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-            
-            print(f"Extracted to {extract_dir}")
-            os.remove(file_path) # remove the original zip file
-            return extract_dir
+        if unzip and zipfile.is_zipfile(file_path):
+            return _extract_zip(file_path, output_dir)
         else:
             return file_path
 
@@ -59,15 +93,227 @@ def download_and_unzip(url, output_dir='.'):
         print(f"Error downloading file: {e}")
         return None
 
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(meta_path, meta):
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _plan_segments(size, segments):
+    """Splits [0, size) into at most `segments` inclusive byte ranges."""
+    if size is None or segments <= 1 or size < 2 * MIN_SEGMENT_SIZE:
+        return [(0, None if size is None else size - 1)]
+    count = min(segments, size // MIN_SEGMENT_SIZE)
+    step = size // count
+    ranges = []
+    for i in range(count):
+        start = i * step
+        end = size - 1 if i == count - 1 else start + step - 1
+        ranges.append((start, end))
+    return ranges
+
+
+def _fetch_segment(url, segment_path, start, end, validator, session=None):
+    """
+    Downloads bytes [start, end] of `url` into `segment_path`, resuming from
+    whatever is already on disk.
+
+    Returns:
+        int: The number of bytes transferred by this call.
+    """
+    have = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+    if end is not None and have >= end - start + 1:
+        # Nothing left to fetch; an empty file still needs its (empty) segment.
+        open(segment_path, 'ab').close()
+        return 0
+
+    headers = {}
+    if end is not None:
+        headers['Range'] = f"bytes={start + have}-{end}"
+        if validator:
+            headers['If-Range'] = validator
+    elif have:
+        # Size unknown: the server cannot be asked for a range, start over.
+        have = 0
+
+    http = session or requests
+    with http.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        if 'Range' in headers and response.status_code != 206:
+            raise requests.exceptions.RequestException(
+                f"Server ignored range request for {url} (HTTP {response.status_code})")
+        written = 0
+        with open(segment_path, 'ab' if have else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                written += len(chunk)
+    return written
+
+
+def download_file(url, output_dir='.', segments=4, segment_pool=None, session=None, unzip=True):
+    """
+    Downloads a single file using parallel HTTP Range segments, resuming any
+    interrupted transfer and skipping the download if the remote file is
+    unchanged since the last run (ETag / Last-Modified).
+
+    Args:
+        url (str): The URL of the file to download.
+        output_dir (str): The directory to save the file in.
+        segments (int): Maximum number of concurrent Range requests for this file.
+        segment_pool (ThreadPoolExecutor, optional): Pool used for segment transfers.
+        session (requests.Session, optional): Session used for all HTTP calls.
+        unzip (bool): Extract the file after download if it is a zip file.
+
+    Returns:
+        DownloadResult: The final path, bytes transferred and elapsed time.
+    """
+    http = session or requests
+    filename = _filename_from_url(url)
+    file_path = os.path.join(output_dir, filename)
+    meta_path = f"{file_path}.meta.json"
+    meta = _load_meta(meta_path)
+    started = time.perf_counter()
+
+    headers = {}
+    if meta.get('complete') and os.path.exists(meta.get('path', '')):
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    head = http.head(url, headers=headers, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+    if head.status_code == 304:
+        print(f"{filename} is unchanged, skipping.")
+        return DownloadResult(url, meta['path'], 0, time.perf_counter() - started, skipped=True)
+    head.raise_for_status()
+
+    etag = head.headers.get('ETag')
+    last_modified = head.headers.get('Last-Modified')
+    size = head.headers.get('Content-Length')
+    size = int(size) if size and size.isdigit() else None
+    accepts_ranges = head.headers.get('Accept-Ranges', '').lower() == 'bytes'
+
+    if headers and ((etag and etag == meta.get('etag')) or
+                    (not etag and last_modified and last_modified == meta.get('last_modified'))):
+        print(f"{filename} is unchanged, skipping.")
+        return DownloadResult(url, meta['path'], 0, time.perf_counter() - started, skipped=True)
+
+    ranges = _plan_segments(size if accepts_ranges else None, segments)
+    segment_paths = [f"{file_path}.part{i}" for i in range(len(ranges))]
+
+    # Partial segments are only reusable if they belong to the same remote file.
+    same_remote = (not meta.get('complete') and meta.get('size') == size and
+                   meta.get('etag') == etag and meta.get('last_modified') == last_modified and
+                   meta.get('segments') == len(ranges))
+    if not same_remote:
+        for path in segment_paths:
+            if os.path.exists(path):
+                os.remove(path)
+    _save_meta(meta_path, {'url': url, 'etag': etag, 'last_modified': last_modified,
+                           'size': size, 'segments': len(ranges), 'complete': False})
+
+    validator = etag or last_modified
+    print(f"Downloading {filename} to {file_path} in {len(ranges)} segment(s)...")
+    if len(ranges) == 1 or segment_pool is None:
+        written = sum(_fetch_segment(url, path, start, end, validator, session)
+                      for path, (start, end) in zip(segment_paths, ranges))
+    else:
+        futures = [segment_pool.submit(_fetch_segment, url, path, start, end, validator, session)
+                   for path, (start, end) in zip(segment_paths, ranges)]
+        written = sum(future.result() for future in futures)
+
+    with open(file_path, 'wb') as out:
+        for path in segment_paths:
+            with open(path, 'rb') as part:
+                shutil.copyfileobj(part, out, CHUNK_SIZE)
+    for path in segment_paths:
+        os.remove(path)
+
+    if size is not None and os.path.getsize(file_path) != size:
+        raise requests.exceptions.RequestException(
+            f"Size mismatch for {filename}: expected {size}, got {os.path.getsize(file_path)}")
+
+    final_path = file_path
+    if unzip and zipfile.is_zipfile(file_path):
+        final_path = _extract_zip(file_path, output_dir)
+
+    elapsed = time.perf_counter() - started
+    _save_meta(meta_path, {'url': url, 'etag': etag, 'last_modified': last_modified,
+                           'size': size, 'segments': len(ranges), 'complete': True,
+                           'path': final_path})
+    result = DownloadResult(url, final_path, written, elapsed)
+    print(f"Downloaded {filename}: {written / (1024 * 1024):.1f} MB in {elapsed:.1f}s "
+          f"({result.throughput_mb_s:.2f} MB/s)")
+    return result
+
+
+def download_all(urls, output_dir='.', max_workers=4, segments=4, session=None, unzip=True):
+    """
+    Downloads several files concurrently, e.g. all part files of a
+    Companies House snapshot.
+
+    Args:
+        urls (list[str]): The URLs to download.
+        output_dir (str): The directory to save the files in.
+        max_workers (int): Number of files downloaded at the same time.
+        segments (int): Number of Range segments per file.
+        session (requests.Session, optional): Session used for all HTTP calls,
+            e.g. one pointed at a local stand-in server.
+        unzip (bool): Extract zip files after download.
+
+    Returns:
+        list[DownloadResult | None]: One result per URL, in input order.
+            None marks a failed download.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    def run(url):
+        try:
+            return download_file(url, output_dir, segments, segment_pool, session, unzip)
+        except (requests.exceptions.RequestException, OSError, zipfile.BadZipFile) as e:
+            print(f"Error downloading {url}: {e}")
+            return None
+
+    # Segments get their own pool so file workers never wait on a slot they hold.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers * segments)) as segment_pool, \
+            ThreadPoolExecutor(max_workers=max(1, max_workers)) as file_pool:
+        return list(file_pool.map(run, urls))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='A tool to download a file from a URL and unzip it.')
-    parser.add_argument('url', type=str, help='The URL of the file to download.')
+    parser.add_argument('url', type=str, nargs='+', help='The URL(s) of the file(s) to download.')
     parser.add_argument('--output_dir', type=str, default='companydata', help='The directory to save the file in.')
+    parser.add_argument('--workers', type=int, default=4, help='Number of files to download concurrently.')
+    parser.add_argument('--segments', type=int, default=4, help='Number of HTTP Range segments per file.')
+    parser.add_argument('--keep_zip', action='store_true', help='Keep zip files as downloaded instead of extracting them.')
     args = parser.parse_args()
-    
+
     if not args.url:
         print("Please provide a URL in the 'url' argument.")
-    else:
-        downloaded_path = download_and_unzip(args.url, args.output_dir)
+    elif len(args.url) == 1 and args.workers <= 1 and args.segments <= 1:
+        downloaded_path = download_and_unzip(args.url[0], args.output_dir, unzip=not args.keep_zip)
         if downloaded_path:
             print(f"\nFile processed successfully. Final path: {downloaded_path}")
+    else:
+        results = download_all(args.url, args.output_dir, args.workers, args.segments,
+                               unzip=not args.keep_zip)
+        print()
+        for url, result in zip(args.url, results):
+            if result is None:
+                print(f"FAILED   {url}")
+            elif result.skipped:
+                print(f"SKIPPED  {result.path} (unchanged)")
+            else:
+                print(f"OK       {result.path} ({result.throughput_mb_s:.2f} MB/s)")
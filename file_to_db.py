@@ -3,48 +3,420 @@
 import pandas as pd
 import sqlite3
 import os
+import io
+import re
+import csv
+import json
+import hashlib
+import glob
+import time
+import queue
+import zipfile
+import tempfile
 import argparse
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from typing import Union
+from db_pool import get_pool, run_in_executor, ensure_wal
+from sql_guard import GuardError, TimeBudget, prepare_select, split_statements, check_plan, MAX_ROWS, TIME_BUDGET
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = "companydata/companydata.db"
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql',
+                           'CREATE TABLE IF NOT EXISTS "companies" (.sql')
+
+# Pragmas applied for the duration of a bulk load; the previous values are restored afterwards.
+# cache_size is added from the memory budget, see import_memory_plan. Sorts for
+# the index builds spill to temporary files rather than growing the heap.
+BULK_LOAD_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'temp_store': 'FILE',
+}
+
+# Parse-time dtypes for each declared SQLite type. Nullable extension types keep
+# integer columns integral when values are missing.
+SQL_TO_PANDAS_DTYPE = {
+    'TEXT': str,
+    'INTEGER': 'Int64',
+    'REAL': 'Float64',
+}
+
+# Memory budget of an import as a whole, on top of each process's interpreter
+# baseline. PAGE_CACHE_SHARE of it is SQLite's page cache; the rest is split
+# between the parsed batches in flight, whose chunk size adapts to the measured
+# bytes per row to stay within their share.
+MEMORY_CAP_MB = 1024
+PAGE_CACHE_SHARE = 0.5
+# Default budget of a single parsed batch: a lone parser's share of MEMORY_CAP_MB.
+BATCH_MEMORY_MB = MEMORY_CAP_MB * (1 - PAGE_CACHE_SHARE)
+# A parsed chunk is held roughly four times over: raw frame, object copy,
+# NA mask and the row tuples handed to SQLite.
+CHUNK_MEMORY_OVERHEAD = 4
+MIN_CHUNKSIZE = 1000
+PROBE_CHUNKSIZE = 5000
+# Rows sampled per chunk when measuring memory; deep memory_usage over a whole
+# chunk of strings costs almost as much as parsing it.
+MEMORY_SAMPLE_ROWS = 500
+
+# Incremental loads modify pages of an existing database, so their rollback
+# journal goes to disk instead of holding a copy of every touched page in memory.
+INCREMENTAL_LOAD_PRAGMAS = {**BULK_LOAD_PRAGMAS, 'journal_mode': 'TRUNCATE'}
+
+# One hash per company row, used by incremental loads to find changed rows.
+ROW_HASHES_DDL = ('CREATE TABLE IF NOT EXISTS company_row_hashes ('
+                  'CompanyNumber TEXT PRIMARY KEY, row_hash INTEGER NOT NULL) WITHOUT ROWID;')
+
+# Precomputed facts about the data, written at import time and read by the server
+# to build its prompt without scanning the table. Values are JSON.
+CATALOG_DDL = 'CREATE TABLE IF NOT EXISTS db_catalog (key TEXT PRIMARY KEY, value TEXT NOT NULL);'
+# Columns whose distinct values are listed in the catalog, if there are at most
+# CATALOG_MAX_DISTINCT of them.
+CATALOG_VALUE_COLUMNS = ['CompanyStatus', 'CompanyCategory', 'AccountsAccountCategory', 'RegAddressCountry']
+CATALOG_MAX_DISTINCT = 100
+# Most common registered counties kept in the catalog for question matching.
+CATALOG_MAX_COUNTIES = 2000
+
+# Companies House writes dates as DD/MM/YYYY; they are stored as ISO YYYY-MM-DD
+# so they sort and compare as text and range predicates can use an index.
+_UK_DATE = r'^(\d{1,2})/(\d{1,2})/(\d{4})$'
+
+INDEXES = {
+    # The filter columns the templates use carry CompanyNumber too, so keyset
+    # pages (see keyset_query) are an index range, not a scan or a sort.
+    'idx_company_status': 'CREATE INDEX IF NOT EXISTS idx_company_status ON companies (CompanyStatus, CompanyNumber);',
+    'idx_accounts_category': 'CREATE INDEX IF NOT EXISTS idx_accounts_category ON companies (AccountsAccountCategory, CompanyNumber);',
+    'idx_reg_address_county': 'CREATE INDEX IF NOT EXISTS idx_reg_address_county ON companies (UPPER(RegAddressCounty), CompanyNumber);',
+    'idx_accounts_due_date': 'CREATE INDEX IF NOT EXISTS idx_accounts_due_date ON companies (AccountsNextDueDate);',
+    'idx_sic_code_1': 'CREATE INDEX IF NOT EXISTS idx_sic_code_1 ON companies (SICCodeSicText_1);',
+    'idx_sic_code_2': 'CREATE INDEX IF NOT EXISTS idx_sic_code_2 ON companies (SICCodeSicText_2);',
+    'idx_sic_code_3': 'CREATE INDEX IF NOT EXISTS idx_sic_code_3 ON companies (SICCodeSicText_3);',
+    'idx_sic_code_4': 'CREATE INDEX IF NOT EXISTS idx_sic_code_4 ON companies (SICCodeSicText_4);',
+    'idx_incorporation_date': 'CREATE INDEX IF NOT EXISTS idx_incorporation_date ON companies (IncorporationDate);',
+    'idx_dissolution_date': 'CREATE INDEX IF NOT EXISTS idx_dissolution_date ON companies (DissolutionDate);',
+    'idx_returns_due_date': 'CREATE INDEX IF NOT EXISTS idx_returns_due_date ON companies (ReturnsNextDueDate);',
+    'idx_conf_stmt_due_date': 'CREATE INDEX IF NOT EXISTS idx_conf_stmt_due_date ON companies (ConfStmtNextDueDate);'
+}
+
+# Filter applied to `populate` when only some companies need refreshing.
+TOUCHED_FILTER = 'CompanyNumber IN (SELECT CompanyNumber FROM temp._touched)'
+
+# SIC codes appear in the CSV as "43220 - Plumbing, heat and air-conditioning installation".
+_SIC_SELECT = ("SELECT CompanyNumber, substr(ltrim(SICCodeSicText_{n}), 1, 5), {n} FROM companies "
+               "WHERE {{filter}} AND ltrim(SICCodeSicText_{n}) GLOB '[0-9][0-9][0-9][0-9][0-9]*'")
+
+# Summary tables are running counts: populate adds the counts of the companies
+# matching {filter}, purge subtracts those of the touched companies and drops
+# groups that reach zero.
+def _count_upsert(table, keys, source, count='COUNT(*)', where='{filter}', sign=''):
+    columns = ', '.join(keys)
+    group_by = ', '.join(str(i) for i in range(1, len(keys) + 1))
+    return (f"INSERT INTO {table} ({columns}, n) SELECT {', '.join(keys.values())}, {sign}{count} "
+            f"FROM {source} WHERE {where} GROUP BY {group_by} "
+            f"ON CONFLICT({columns}) DO UPDATE SET n = n + excluded.n")
 
-def csv_to_sqlite(csv_path, table_name, chunksize=50000):
+
+# NULLs are stored as '' because primary key columns of WITHOUT ROWID tables cannot be NULL.
+# Counties are free text ('Essex', 'ESSEX'), so they are counted uppercased, the
+# same case-insensitive rule the county filters of the templates use.
+_COMPANY_COUNT_KEYS = {col: f"coalesce({col}, '')" for col in
+                       ('CompanyStatus', 'CompanyCategory', 'AccountsAccountCategory')}
+_COMPANY_COUNT_KEYS['RegAddressCounty'] = "upper(coalesce(RegAddressCounty, ''))"
+_SIC_COUNT_KEYS = {'sic_code': 'sic_code'}
+_SIC_COUNT_SOURCE = ('(' + ' UNION ALL '.join(
+    f"SELECT CompanyNumber, substr(ltrim(SICCodeSicText_{n}), 1, 5) AS sic_code FROM companies "
+    f"WHERE {{filter}} AND ltrim(SICCodeSicText_{n}) GLOB '[0-9][0-9][0-9][0-9][0-9]*'" for n in range(1, 5)) + ')')
+_DUE_MONTH_KEYS = {'due_month': "coalesce(substr(AccountsNextDueDate, 1, 7), '')"}
+
+# Tables derived from companies. Bulk loads rebuild them after the main insert;
+# incremental loads `purge` the rows of touched companies (temp._touched) before
+# the upsert and `populate` them again afterwards with TOUCHED_FILTER. Both may
+# be one statement or a list, with a {filter} placeholder. An optional `stale`
+# query returns a row when the table was built by an older definition, and
+# must then be rebuilt in full rather than adjusted.
+DERIVED_TABLES = {
+    'company_sic': {
+        'ddl': ['CREATE TABLE IF NOT EXISTS company_sic ('
+                'company_number TEXT NOT NULL, sic_code TEXT NOT NULL, position INTEGER NOT NULL, '
+                'PRIMARY KEY (company_number, position)) WITHOUT ROWID;'],
+        'indexes': ['CREATE INDEX IF NOT EXISTS idx_company_sic_code ON company_sic (sic_code, company_number);'],
+        'populate': ('INSERT INTO company_sic (company_number, sic_code, position) ' +
+                     ' UNION ALL '.join(_SIC_SELECT.format(n=n) for n in range(1, 5))),
+        'purge': 'DELETE FROM company_sic WHERE company_number IN (SELECT CompanyNumber FROM temp._touched)',
+    },
+    # Full-text index over names and addresses. Its rowid is companies.rowid, so
+    # run the index action again after a VACUUM, which may renumber rowids.
+    'companies_fts': {
+        'ddl': ['CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5('
+                'CompanyName, PreviousNames, RegAddressAddressLine1, RegAddressAddressLine2, '
+                'RegAddressPostTown, RegAddressCounty, RegAddressPostCode, '
+                "tokenize = 'unicode61 remove_diacritics 2');"],
+        'indexes': [],
+        'populate': ('INSERT INTO companies_fts (rowid, CompanyName, PreviousNames, RegAddressAddressLine1, '
+                     'RegAddressAddressLine2, RegAddressPostTown, RegAddressCounty, RegAddressPostCode) '
+                     'SELECT rowid, CompanyName, ' +
+                     " || ' ' || ".join(f"coalesce(PreviousName_{n}CompanyName, '')" for n in range(1, 11)) +
+                     ', RegAddressAddressLine1, RegAddressAddressLine2, RegAddressPostTown, RegAddressCounty, '
+                     'RegAddressPostCode FROM companies WHERE {filter}'),
+        'purge': ('DELETE FROM companies_fts WHERE rowid IN (SELECT rowid FROM companies '
+                  'WHERE CompanyNumber IN (SELECT CompanyNumber FROM temp._touched))'),
+    },
+    # Company counts by status x category x accounts category x county, for
+    # count and breakdown questions and the DISTINCT lookups in SqlQuery.
+    'agg_company_counts': {
+        'ddl': ['CREATE TABLE IF NOT EXISTS agg_company_counts ('
+                'CompanyStatus TEXT NOT NULL, CompanyCategory TEXT NOT NULL, AccountsAccountCategory TEXT NOT NULL, '
+                'RegAddressCounty TEXT NOT NULL, n INTEGER NOT NULL, '
+                'PRIMARY KEY (CompanyStatus, CompanyCategory, AccountsAccountCategory, RegAddressCounty)) WITHOUT ROWID;'],
+        'indexes': [],
+        'populate': _count_upsert('agg_company_counts', _COMPANY_COUNT_KEYS, 'companies'),
+        'purge': [_count_upsert('agg_company_counts', _COMPANY_COUNT_KEYS, 'companies', sign='-'),
+                  'DELETE FROM agg_company_counts WHERE n <= 0'],
+        'stale': 'SELECT 1 FROM agg_company_counts WHERE RegAddressCounty != upper(RegAddressCounty) LIMIT 1',
+    },
+    # Number of companies listing each SIC code.
+    'agg_sic_counts': {
+        'ddl': ['CREATE TABLE IF NOT EXISTS agg_sic_counts ('
+                'sic_code TEXT PRIMARY KEY, n INTEGER NOT NULL) WITHOUT ROWID;'],
+        'indexes': [],
+        'populate': _count_upsert('agg_sic_counts', _SIC_COUNT_KEYS, _SIC_COUNT_SOURCE,
+                                  count='COUNT(DISTINCT CompanyNumber)', where='true'),
+        'purge': [_count_upsert('agg_sic_counts', _SIC_COUNT_KEYS, _SIC_COUNT_SOURCE,
+                                count='COUNT(DISTINCT CompanyNumber)', where='true', sign='-'),
+                  'DELETE FROM agg_sic_counts WHERE n <= 0'],
+    },
+    # Histogram of accounts due dates by month ('YYYY-MM', '' when unknown).
+    'agg_accounts_due_months': {
+        'ddl': ['CREATE TABLE IF NOT EXISTS agg_accounts_due_months ('
+                'due_month TEXT PRIMARY KEY, n INTEGER NOT NULL) WITHOUT ROWID;'],
+        'indexes': [],
+        'populate': _count_upsert('agg_accounts_due_months', _DUE_MONTH_KEYS, 'companies'),
+        'purge': [_count_upsert('agg_accounts_due_months', _DUE_MONTH_KEYS, 'companies', sign='-'),
+                  'DELETE FROM agg_accounts_due_months WHERE n <= 0'],
+    },
+}
+
+# Group-by choices for count questions, see build_aggregate_query.
+AGGREGATE_GROUPS = {
+    'status': 'CompanyStatus',
+    'company_category': 'CompanyCategory',
+    'accounts_category': 'AccountsAccountCategory',
+    'county': 'RegAddressCounty',
+}
+
+# Top-level clauses checked by keyset_pageable, once literals and parentheses are blanked out.
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PARENTHESIZED = re.compile(r'\([^()]*\)')
+_ORDER_BY = re.compile(r'\bORDER\s+BY\s+(.*?)(?=\bLIMIT\b|$)', re.IGNORECASE | re.DOTALL)
+_LIMIT_CLAUSE = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+_KEYSET_ORDER = re.compile(r'^(?:\w+\.)?["`\[]?CompanyNumber["`\]]?(?:\s+ASC)?$', re.IGNORECASE)
+
+# Imports write a new database file under builds/ next to DB_PATH, which is a
+# symlink to the current build. The server switches to a build once it is
+# complete and validated, so a reload never locks or half-shows the live data.
+BUILDS_DIR = 'builds'
+# Builds kept besides the current one, for rollback and readers still draining.
+KEEP_BUILDS = 2
+# Seconds to wait for readers when checkpointing a legacy database before moving it.
+CHECKPOINT_TIMEOUT = 30
+# quick_check message for a NULL in a NOT NULL column, see _quick_check.
+_NULL_VALUE = re.compile(r'^NULL value in (\w+)\.(\w+)$')
+
+# companies_fts column groups accepted by search_companies.
+FTS_COLUMNS = {
+    'name': ['CompanyName', 'PreviousNames'],
+    'address': ['RegAddressAddressLine1', 'RegAddressAddressLine2', 'RegAddressPostTown',
+                'RegAddressCounty', 'RegAddressPostCode'],
+}
+
+
+def load_schema(schema_path=SCHEMA_PATH):
     """
-    Reads a large CSV file in chunks and loads it into a SQLite database table.
+    Reads the canonical companies DDL from the sql/ directory.
+
+    Args:
+        schema_path (str, optional): Path to the DDL file.
+
+    Returns:
+        tuple[str, list[tuple[str, str]]]: The CREATE TABLE statement and the
+            (column name, declared type) pairs in table order.
+    """
+    with open(schema_path, encoding='utf-8') as f:
+        ddl = f.read()
+    create_table = next(stmt.strip() for stmt in ddl.split(';')
+                        if stmt.strip().upper().startswith('CREATE TABLE'))
+    columns = re.findall(r'"(\w+)"\s+(TEXT|REAL|INTEGER)', create_table)
+    return create_table + ';', columns
+
+
+def date_columns(schema):
+    """Names of the schema columns holding dates (…Date and PreviousName_NCONDATE)."""
+    return [name for name, _ in schema if name.endswith('Date') or name.endswith('CONDATE')]
+
+
+def normalize_dates(chunk, columns):
+    """
+    Rewrites DD/MM/YYYY values in `columns` to ISO YYYY-MM-DD in place.
+
+    Values already in another form (e.g. ISO) are left as they are.
+    """
+    for col in columns:
+        if col not in chunk.columns:
+            continue
+        values = chunk[col].str.strip()
+        parts = values.str.extract(_UK_DATE)
+        iso = parts[2] + '-' + parts[1].str.zfill(2) + '-' + parts[0].str.zfill(2)
+        chunk[col] = iso.where(parts[2].notna(), values)
+    return chunk
+
+
+def import_memory_plan(memory_cap_mb=MEMORY_CAP_MB, parse_workers=1):
+    """
+    Splits an import's memory budget between SQLite's page cache and parsing.
+
+    With one parser a single batch is in flight. With a pool, each worker
+    parses one, up to one per worker waits in the queue and the writer
+    inserts one, i.e. 2 x workers + 1.
+
+    Returns:
+        tuple[int, float]: The cache_size pragma value (negative, in KiB) and
+            the budget in MB of each parsed batch.
+    """
+    cache_kib = int(memory_cap_mb * 1024 * PAGE_CACHE_SHARE)
+    batches_in_flight = 1 if parse_workers <= 1 else 2 * parse_workers + 1
+    return -cache_kib, memory_cap_mb * (1 - PAGE_CACHE_SHARE) / batches_in_flight
+
+
+def schema_dtypes(schema):
+    """Maps each schema column to the pandas dtype it is parsed as."""
+    return {name: SQL_TO_PANDAS_DTYPE[sql_type] for name, sql_type in schema}
+
+
+def read_typed_chunks(handle, schema, memory_cap_mb=BATCH_MEMORY_MB, max_chunksize=50000):
+    """
+    Parses a CSV stream with the C engine into chunks typed from the schema.
+
+    Only schema columns are parsed (usecols), each with an explicit dtype, so
+    mixed-type columns are not inferred per chunk. Date columns are normalized
+    to ISO YYYY-MM-DD. The chunk size starts small and is then adapted so a
+    chunk stays within `memory_cap_mb`.
 
     Args:
-        csv_path (str): The path to the input CSV file.
+        handle (io.TextIOBase): An open CSV text stream positioned at the header.
+        schema (list[tuple[str, str]]): (column name, SQL type) pairs, see load_schema.
+        memory_cap_mb (int): Memory budget for one chunk in flight.
+        max_chunksize (int): Upper bound on rows per chunk.
+
+    Yields:
+        pd.DataFrame: Chunks with cleaned column names.
+    """
+    header = next(csv.reader([handle.readline()]))
+    names = [clean_column_name(col) for col in header]
+    dtypes = schema_dtypes(schema)
+    usecols = [name for name in names if name in dtypes]
+    dates = date_columns(schema)
+
+    reader = pd.read_csv(handle, header=None, names=names, usecols=usecols,
+                         dtype={name: dtypes[name] for name in usecols},
+                         engine='c', chunksize=PROBE_CHUNKSIZE, on_bad_lines='warn')
+    budget = memory_cap_mb * 1024 * 1024 / CHUNK_MEMORY_OVERHEAD
+    chunksize = min(PROBE_CHUNKSIZE, max_chunksize)
+    bytes_per_row = 0
+    with reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(chunksize)
+            except StopIteration:
+                return
+            if chunk.empty:
+                return
+            # Size on the widest rows seen so far so a wide tail cannot overshoot.
+            sample = chunk.iloc[::max(1, len(chunk) // MEMORY_SAMPLE_ROWS)]
+            bytes_per_row = max(bytes_per_row, sample.memory_usage(deep=True).sum() / len(sample))
+            chunksize = int(max(MIN_CHUNKSIZE, min(max_chunksize, budget // bytes_per_row)))
+            yield normalize_dates(chunk, dates)
+
+
+def clean_column_name(col):
+    """Strips a CSV header down to a valid SQL identifier, e.g. 'RegAddress.CareOf' -> 'RegAddressCareOf'."""
+    return ''.join(e for e in col if e.isalnum() or e == '_')
+
+def iter_csv_sources(paths):
+    """
+    Yields readable CSV streams for a CSV path, a zip path, or a list of either.
+
+    Zip archives are read member by member through ZipFile.open, so the
+    extracted CSVs are never written to disk.
+
+    Args:
+        paths (str | list[str]): CSV and/or zip file paths.
+
+    Yields:
+        tuple[str, io.TextIOBase]: A label for the source and an open text stream.
+            The stream is closed when the generator advances.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith('.csv'):
+                        continue
+                    with archive.open(member) as raw, \
+                            io.TextIOWrapper(raw, encoding='utf-8', newline='') as handle:
+                        yield f"{path}:{member.filename}", handle
+        else:
+            with open(path, encoding='utf-8', newline='') as handle:
+                yield path, handle
+
+
+def csv_to_sqlite(csv_path, table_name, chunksize=50000, memory_cap_mb=MEMORY_CAP_MB, db_path=None):
+    """
+    Reads large CSV files in chunks and loads them into a SQLite database table.
+
+    Args:
+        csv_path (str | list[str]): Path to a CSV file or a zip archive of CSV
+            files, or a list of such paths. Zip members are streamed without
+            being extracted.
         table_name (str): The name of the table to create/replace.
-        chunksize (int): The number of rows to read per chunk.
+        chunksize (int): The maximum number of rows to read per chunk.
+        memory_cap_mb (int): Memory budget for the import, see import_memory_plan.
+        db_path (str, optional): Path to the SQLite database. Uses DB_PATH if not provided.
     """
-    if not os.path.exists(csv_path):
-        print(f"Error: CSV file not found at {csv_path}")
-        return False
+    paths = [csv_path] if isinstance(csv_path, (str, os.PathLike)) else list(csv_path)
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Error: CSV file not found at {path}")
+            return False
 
-    print(f"Connecting to database at {DB_PATH}...")
-    conn = sqlite3.connect(DB_PATH)
-    
-    print(f"Reading CSV from {csv_path} in chunks...")
-    try:
-        chunk_iter = pd.read_csv(csv_path, chunksize=chunksize, low_memory=False, on_bad_lines='warn')
+    _, schema = load_schema()
+    dtype = {name: sql_type for name, sql_type in schema}
+
+    db_to_use = db_path if db_path else DB_PATH
+    print(f"Connecting to database at {db_to_use}...")
+    conn = sqlite3.connect(db_to_use)
+    cache_size, chunk_cap_mb = import_memory_plan(memory_cap_mb)
+    conn.execute(f'PRAGMA cache_size = {cache_size}')
 
+    try:
         first_chunk = True
-        for i, chunk in enumerate(chunk_iter):
-            print(f"Processing chunk {i+1}...")
-            if_exists_param = 'replace' if first_chunk else 'append'
-            
-            # Clean column names to be valid SQL identifiers
-            clean_columns = {}
-            for col in chunk.columns:
-                clean_col = ''.join(e for e in col if e.isalnum() or e == '_')
-                clean_columns[col] = clean_col
-            chunk.rename(columns=clean_columns, inplace=True)
-            
-            chunk.to_sql(table_name, conn, if_exists=if_exists_param, index=False)
-            first_chunk = False
-        
-        print(f"\nSuccessfully loaded data into '{table_name}' table in {DB_PATH}")
+        for source, handle in iter_csv_sources(paths):
+            print(f"Reading CSV from {source} in chunks...")
+            chunk_iter = read_typed_chunks(handle, schema, chunk_cap_mb, chunksize)
+
+            for i, chunk in enumerate(chunk_iter):
+                print(f"Processing chunk {i+1} ({len(chunk):,} rows)...")
+                if_exists_param = 'replace' if first_chunk else 'append'
+
+                chunk.to_sql(table_name, conn, if_exists=if_exists_param, index=False,
+                             dtype={col: dtype[col] for col in chunk.columns})
+                first_chunk = False
+
+        print(f"\nSuccessfully loaded data into '{table_name}' table in {db_to_use}")
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -55,17 +427,739 @@ def csv_to_sqlite(csv_path, table_name, chunksize=50000):
     return True
 
 
-def query_companies_table(sql: str, return_json: bool = True) -> Union[pd.DataFrame, str]:
+def _chunk_to_rows(chunk, columns):
+    """Aligns a chunk to `columns` and converts it to tuples with NaN mapped to None."""
+    chunk = chunk.reindex(columns=columns)
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def row_hash(row):
+    """Stable signed 64-bit hash of a parsed row, as stored in company_row_hashes."""
+    digest = hashlib.blake2b(repr(row).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def iter_row_batches(csv_path, schema, chunksize=50000, memory_cap_mb=BATCH_MEMORY_MB):
+    """
+    Parses CSV/zip sources into batches of row tuples ordered like `schema`.
+
+    Args:
+        csv_path (str | list[str]): CSV and/or zip file paths.
+        schema (list[tuple[str, str]]): Target columns; missing columns become NULL.
+        chunksize (int): The maximum number of rows per batch.
+        memory_cap_mb (int): Memory budget for one batch in flight.
+
+    Yields:
+        tuple[list[tuple], list[int]]: Rows ready for executemany and their row hashes.
+    """
+    columns = [name for name, _ in schema]
+    for source, handle in iter_csv_sources(csv_path):
+        print(f"Reading CSV from {source} in chunks...")
+        for chunk in read_typed_chunks(handle, schema, memory_cap_mb, chunksize):
+            rows = _chunk_to_rows(chunk, columns)
+            yield rows, [row_hash(row) for row in rows]
+
+
+# Set in each parse worker by _init_parse_worker; batches flow back to the writer through it.
+_batch_queue = None
+
+
+def _init_parse_worker(batch_queue):
+    global _batch_queue
+    _batch_queue = batch_queue
+
+
+def _parse_part(path, schema, chunksize, memory_cap_mb):
+    """Parses one part file in a worker process and streams its batches to the writer."""
+    started = time.perf_counter()
+    rows = 0
+    try:
+        for batch in iter_row_batches(path, schema, chunksize, memory_cap_mb):
+            _batch_queue.put(('rows', path, batch))
+            rows += len(batch[0])
+        _batch_queue.put(('done', path, (rows, time.perf_counter() - started)))
+    except Exception as e:
+        _batch_queue.put(('error', path, str(e)))
+
+
+def iter_row_batches_parallel(paths, schema, workers=None, chunksize=50000, memory_cap_mb=BATCH_MEMORY_MB):
+    """
+    Parses and cleans part files in a process pool and yields their batches in
+    the calling process, which stays the only database writer.
+
+    Batches from different parts interleave in arrival order. The queue between
+    the workers and the writer holds one batch per worker, so parsing never runs
+    far ahead of the inserts and at most 2 x workers + 1 batches are in memory
+    (see import_memory_plan).
+
+    Args:
+        paths (list[str]): CSV and/or zip part files.
+        schema (list[tuple[str, str]]): Target columns, see load_schema.
+        workers (int, optional): Number of parse processes. Defaults to the CPU count.
+        chunksize (int): The maximum number of rows per batch.
+        memory_cap_mb (int): Memory budget for one batch in flight.
+
+    Yields:
+        tuple[list[tuple], list[int]]: Rows ready for executemany and their row hashes.
+
+    Raises:
+        RuntimeError: If a part file fails to parse.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    batch_queue = multiprocessing.Queue(maxsize=workers)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker,
+                               initargs=(batch_queue,))
+    futures = [pool.submit(_parse_part, path, schema, chunksize, memory_cap_mb) for path in paths]
+    remaining = len(paths)
+    try:
+        while remaining:
+            try:
+                kind, path, payload = batch_queue.get(timeout=1)
+            except queue.Empty:
+                for future in futures:
+                    if future.done() and future.exception():
+                        raise RuntimeError(f"Parse worker failed: {future.exception()}")
+                continue
+            if kind == 'rows':
+                yield payload
+            elif kind == 'done':
+                remaining -= 1
+                rows, seconds = payload
+                print(f"Parsed {path}: {rows:,} rows in {seconds:.1f}s "
+                      f"({rows / max(seconds, 1e-9):,.0f} rows/sec), {remaining} part(s) left")
+            else:
+                raise RuntimeError(f"Failed to parse {path}: {payload}")
+    finally:
+        for future in futures:
+            future.cancel()
+        # Workers may be blocked on a full queue; keep draining until they exit.
+        while not all(future.done() for future in futures):
+            try:
+                batch_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        pool.shutdown()
+        batch_queue.close()
+
+
+def _apply_pragmas(conn, pragmas):
+    """Sets each pragma and returns the values they had before."""
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = conn.execute(f'PRAGMA {name}').fetchone()[0]
+        conn.execute(f'PRAGMA {name} = {value}')
+    return previous
+
+
+def _create_indexes(conn):
+    for name, sql in INDEXES.items():
+        # An index whose definition has changed since it was built is rebuilt.
+        existing = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone()
+        if existing and existing[0] != sql.replace(' IF NOT EXISTS', '').rstrip(';'):
+            print(f"Dropping outdated index {name}...")
+            conn.execute(f'DROP INDEX "{name}"')
+        print(f"Creating index {name}...")
+        conn.execute(sql)
+
+
+def _run_statements(conn, statements, filter):
+    for sql in [statements] if isinstance(statements, str) else statements:
+        conn.execute(sql.format(filter=filter))
+
+
+def _rebuild_derived_table(conn, name):
+    table = DERIVED_TABLES[name]
+    print(f"Building {name}...")
+    conn.execute(f'DROP TABLE IF EXISTS {name}')
+    for sql in table['ddl']:
+        conn.execute(sql)
+    _run_statements(conn, table['populate'], '1')
+    for sql in table['indexes']:
+        conn.execute(sql)
+
+
+def _rebuild_derived_tables(conn):
+    for name in DERIVED_TABLES:
+        _rebuild_derived_table(conn, name)
+
+
+def _resolve_paths(csv_path):
+    """Normalizes csv_path to a list, returning None if any file is missing."""
+    paths = [csv_path] if isinstance(csv_path, (str, os.PathLike)) else list(csv_path)
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Error: CSV file not found at {path}")
+            return None
+    return paths
+
+
+def _load_plan(paths, workers, memory_cap_mb):
+    """The cache_size pragma, parse workers and per-batch budget of a load within `memory_cap_mb`."""
+    parse_workers = min(workers, len(paths)) if workers > 1 and len(paths) > 1 else 1
+    cache_size, batch_cap_mb = import_memory_plan(memory_cap_mb, parse_workers)
+    return cache_size, parse_workers, batch_cap_mb
+
+
+def _row_batches(paths, schema, workers, chunksize, batch_cap_mb):
+    if workers > 1:
+        return iter_row_batches_parallel(paths, schema, workers, chunksize, batch_cap_mb)
+    return iter_row_batches(paths, schema, chunksize, batch_cap_mb)
+
+
+def _insert_sql(table, columns, verb='INSERT'):
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    return f'{verb} INTO {table} ({column_list}) VALUES ({", ".join("?" * len(columns))})'
+
+
+def bulk_load(csv_path, db_path=None, chunksize=50000, memory_cap_mb=MEMORY_CAP_MB, workers=1):
+    """
+    Rebuilds the companies table from the canonical DDL as fast as SQLite allows.
+
+    The table is dropped and recreated from sql/, every row is inserted with a
+    prepared executemany inside one transaction under relaxed load-time pragmas,
+    indexes are built once the data is in, and ANALYZE refreshes the planner
+    statistics. The previous pragma values are restored afterwards. Row hashes
+    are stored alongside so later loads can run incrementally.
+
+    Args:
+        csv_path (str | list[str]): CSV and/or zip file paths.
+        db_path (str, optional): Path to the SQLite database. Uses DB_PATH if not provided.
+        chunksize (int): The maximum number of rows per batch.
+        memory_cap_mb (int): Memory budget for the load, shared by SQLite's page
+            cache and the batches in flight, see import_memory_plan.
+        workers (int): Number of parse processes. With more than one, files are
+            parsed in parallel by iter_row_batches_parallel while this process
+            remains the single writer.
+
+    Returns:
+        bool: True if the load committed.
+    """
+    paths = _resolve_paths(csv_path)
+    if paths is None:
+        return False
+
+    db_to_use = db_path if db_path else DB_PATH
+    create_table, schema = load_schema()
+    columns = [name for name, _ in schema]
+    number_pos = columns.index('CompanyNumber')
+    insert_sql = _insert_sql('companies', columns, 'INSERT OR REPLACE')
+    hash_sql = 'INSERT OR REPLACE INTO company_row_hashes (CompanyNumber, row_hash) VALUES (?, ?)'
+
+    cache_size, workers, batch_cap_mb = _load_plan(paths, workers, memory_cap_mb)
+
+    print(f"Connecting to database at {db_to_use} for bulk load...")
+    conn = sqlite3.connect(db_to_use, isolation_level=None)
+    previous = _apply_pragmas(conn, {**BULK_LOAD_PRAGMAS, 'cache_size': cache_size})
+    started = time.perf_counter()
+    total = 0
+    try:
+        conn.execute('BEGIN')
+        conn.execute('DROP TABLE IF EXISTS companies')
+        conn.execute('DROP TABLE IF EXISTS company_row_hashes')
+        conn.execute(create_table)
+        conn.execute(ROW_HASHES_DDL)
+        for rows, hashes in _row_batches(paths, schema, workers, chunksize, batch_cap_mb):
+            conn.executemany(insert_sql, rows)
+            conn.executemany(hash_sql, zip((row[number_pos] for row in rows), hashes))
+            total += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"Loaded {total:,} rows ({total / elapsed:,.0f} rows/sec)")
+        load_seconds = time.perf_counter() - started
+
+        _create_indexes(conn)
+        _rebuild_derived_tables(conn)
+        build_catalog(conn)
+        conn.execute('COMMIT')
+        print("Running ANALYZE...")
+        conn.execute('ANALYZE')
+
+        elapsed = time.perf_counter() - started
+        print(f"\nBulk loaded {total:,} rows into 'companies' in {elapsed:.1f}s "
+              f"(insert {total / max(load_seconds, 1e-9):,.0f} rows/sec, "
+              f"overall {total / max(elapsed, 1e-9):,.0f} rows/sec)")
+        return True
+
+    except Exception as e:
+        print(f"An error occurred during bulk load: {e}")
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        return False
+    finally:
+        _apply_pragmas(conn, previous)
+        print("Closing database connection.")
+        conn.close()
+
+
+def build_catalog(conn):
+    """
+    Writes db_catalog and bumps the database generation (PRAGMA user_version).
+
+    The catalog records the companies columns and their types, the distinct
+    values of low-cardinality columns, the min/max of each date column and the
+    row count. Call it inside the load transaction, after the data is final.
+
+    Returns:
+        int: The new generation number.
+    """
+    print("Building catalog...")
+    _, schema = load_schema()
+    columns = conn.execute('SELECT name, type FROM pragma_table_info(?)', ('companies',)).fetchall()
+    distinct_values = {}
+    for col in CATALOG_VALUE_COLUMNS:
+        values = [row[0] for row in conn.execute(
+            f'SELECT {col} FROM companies WHERE {col} IS NOT NULL GROUP BY {col} '
+            f'ORDER BY COUNT(*) DESC LIMIT {CATALOG_MAX_DISTINCT + 1}')]
+        if len(values) <= CATALOG_MAX_DISTINCT:
+            distinct_values[col] = values
+    date_ranges = {col: list(conn.execute(f'SELECT MIN({col}), MAX({col}) FROM companies').fetchone())
+                   for col in date_columns(schema)}
+    # Grouping on UPPER(RegAddressCounty) walks idx_reg_address_county.
+    counties = [row[0] for row in conn.execute(
+        "SELECT UPPER(RegAddressCounty) FROM companies WHERE UPPER(RegAddressCounty) != '' "
+        f"GROUP BY UPPER(RegAddressCounty) ORDER BY COUNT(*) DESC LIMIT {CATALOG_MAX_COUNTIES}")]
+    sic_codes = {}
+    for (text,) in conn.execute(' UNION '.join(f'SELECT SICCodeSicText_{n} FROM companies' for n in range(1, 5))):
+        code, _, description = (text or '').partition(' - ')
+        if re.fullmatch(r'\d{5}', code.strip()):
+            sic_codes[code.strip()] = description.strip()
+    generation = conn.execute('PRAGMA user_version').fetchone()[0] + 1
+    catalog = {
+        'columns': columns,
+        'distinct_values': distinct_values,
+        'date_ranges': date_ranges,
+        'counties': counties,
+        'sic_codes': sic_codes,
+        'row_count': conn.execute('SELECT COUNT(*) FROM companies').fetchone()[0],
+        'generation': generation,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    conn.execute(CATALOG_DDL)
+    conn.execute('DELETE FROM db_catalog')
+    conn.executemany('INSERT INTO db_catalog (key, value) VALUES (?, ?)',
+                     ((key, json.dumps(value)) for key, value in catalog.items()))
+    conn.execute(f'PRAGMA user_version = {generation}')
+    return generation
+
+
+_catalog_cache = {}
+
+
+def load_catalog(db_path=None) -> dict:
+    """
+    Returns the db_catalog contents as a dict, memoized per database generation.
+
+    Databases imported before the catalog existed get a minimal catalog with
+    just the columns.
+    """
+    key = os.path.abspath(db_path or DB_PATH)
+    with get_pool(key).connection() as conn:
+        generation = conn.execute('PRAGMA user_version').fetchone()[0]
+        cached = _catalog_cache.get(key)
+        if cached and cached['generation'] == generation:
+            return cached
+        try:
+            catalog = {k: json.loads(v) for k, v in conn.execute('SELECT key, value FROM db_catalog')}
+        except sqlite3.OperationalError:
+            catalog = {'columns': conn.execute('SELECT name, type FROM pragma_table_info(?)',
+                                               ('companies',)).fetchall(),
+                       'distinct_values': {}, 'date_ranges': {}, 'counties': [], 'sic_codes': {}}
+        catalog['generation'] = generation
+    _catalog_cache[key] = catalog
+    return catalog
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (name,)).fetchone() is not None
+
+
+def incremental_load(csv_path, db_path=None, chunksize=50000, memory_cap_mb=MEMORY_CAP_MB, workers=1):
+    """
+    Applies a new snapshot to an existing companies table, touching only the
+    rows that differ.
+
+    Each incoming row is hashed and compared against company_row_hashes by
+    CompanyNumber. New and changed rows are staged and upserted, and companies
+    missing from the snapshot are deleted, so indexes are only updated for rows
+    that actually changed. Falls back to bulk_load when there is no previous
+    load to compare against. Derived tables (DERIVED_TABLES) are refreshed for
+    the touched companies only.
+
+    Args:
+        csv_path (str | list[str]): CSV and/or zip file paths of the full snapshot.
+        db_path (str, optional): Path to the SQLite database. Uses DB_PATH if not provided.
+        chunksize (int): The maximum number of rows per batch.
+        memory_cap_mb (int): Memory budget for the load, see bulk_load.
+        workers (int): Number of parse processes, see bulk_load.
+
+    Returns:
+        dict | bool: Counts of 'added', 'changed', 'removed' and 'unchanged' rows
+            if the load committed, otherwise False.
+    """
+    paths = _resolve_paths(csv_path)
+    if paths is None:
+        return False
+
+    db_to_use = db_path if db_path else DB_PATH
+    _, schema = load_schema()
+    columns = [name for name, _ in schema]
+    number_pos = columns.index('CompanyNumber')
+
+    print(f"Connecting to database at {db_to_use} for incremental load...")
+    conn = sqlite3.connect(db_to_use, isolation_level=None)
+    if not (_table_exists(conn, 'companies') and _table_exists(conn, 'company_row_hashes')):
+        conn.close()
+        print("No previous load with row hashes found, falling back to a full bulk load.")
+        return bulk_load(paths, db_path, chunksize, memory_cap_mb, workers)
+
+    cache_size, parse_workers, batch_cap_mb = _load_plan(paths, workers, memory_cap_mb)
+    previous = _apply_pragmas(conn, {**INCREMENTAL_LOAD_PRAGMAS, 'cache_size': cache_size})
+    started = time.perf_counter()
+    counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns if c != 'CompanyNumber')
+    try:
+        conn.execute('BEGIN')
+        conn.execute('CREATE TEMP TABLE _seen (CompanyNumber TEXT PRIMARY KEY) WITHOUT ROWID')
+        conn.execute(f'CREATE TEMP TABLE _staged AS SELECT * FROM companies WHERE 0')
+        conn.execute('CREATE TEMP TABLE _staged_hashes (CompanyNumber TEXT PRIMARY KEY, row_hash INTEGER) WITHOUT ROWID')
+        conn.execute('CREATE TEMP TABLE _removed (CompanyNumber TEXT PRIMARY KEY) WITHOUT ROWID')
+        stage_sql = _insert_sql('temp._staged', columns)
+
+        for rows, hashes in _row_batches(paths, schema, parse_workers, chunksize, batch_cap_mb):
+            numbers = [row[number_pos] for row in rows]
+            conn.executemany('INSERT OR IGNORE INTO temp._seen VALUES (?)', ((n,) for n in numbers))
+            stored = dict(conn.execute(
+                'SELECT CompanyNumber, row_hash FROM company_row_hashes '
+                'WHERE CompanyNumber IN (SELECT value FROM json_each(?))', (json.dumps(numbers),)))
+            staged = []
+            for row, number, new_hash in zip(rows, numbers, hashes):
+                old_hash = stored.get(number)
+                if old_hash == new_hash:
+                    counts['unchanged'] += 1
+                    continue
+                counts['added' if old_hash is None else 'changed'] += 1
+                staged.append((row, number, new_hash))
+            conn.executemany(stage_sql, (row for row, _, _ in staged))
+            conn.executemany('INSERT OR REPLACE INTO temp._staged_hashes VALUES (?, ?)',
+                             ((number, new_hash) for _, number, new_hash in staged))
+
+        conn.execute('INSERT INTO temp._removed SELECT CompanyNumber FROM company_row_hashes '
+                     'WHERE CompanyNumber NOT IN (SELECT CompanyNumber FROM temp._seen)')
+        counts['removed'] = conn.execute('SELECT COUNT(*) FROM temp._removed').fetchone()[0]
+
+        conn.execute('CREATE TEMP TABLE _touched (CompanyNumber TEXT PRIMARY KEY) WITHOUT ROWID')
+        conn.execute('INSERT INTO temp._touched SELECT CompanyNumber FROM temp._staged_hashes '
+                     'UNION SELECT CompanyNumber FROM temp._removed')
+        rebuild = [name for name, table in DERIVED_TABLES.items() if not _table_exists(conn, name) or
+                   ('stale' in table and conn.execute(table['stale']).fetchone())]
+        # Purge while the old rows are still in companies.
+        for name, table in DERIVED_TABLES.items():
+            if name not in rebuild:
+                _run_statements(conn, table['purge'], TOUCHED_FILTER)
+
+        conn.execute('DELETE FROM companies WHERE CompanyNumber IN (SELECT CompanyNumber FROM temp._removed)')
+        conn.execute('DELETE FROM company_row_hashes WHERE CompanyNumber IN (SELECT CompanyNumber FROM temp._removed)')
+        # "WHERE true" disambiguates the upsert clause from a join constraint.
+        conn.execute(f'INSERT INTO companies ({column_list}) SELECT {column_list} FROM temp._staged WHERE true '
+                     f'ON CONFLICT(CompanyNumber) DO UPDATE SET {updates}')
+        conn.execute('INSERT OR REPLACE INTO company_row_hashes SELECT CompanyNumber, row_hash FROM temp._staged_hashes')
+        for name, table in DERIVED_TABLES.items():
+            if name in rebuild:
+                _rebuild_derived_table(conn, name)
+            else:
+                _run_statements(conn, table['populate'], TOUCHED_FILTER)
+        build_catalog(conn)
+        conn.execute('COMMIT')
+        conn.execute('PRAGMA optimize')
+
+        elapsed = time.perf_counter() - started
+        print(f"\nIncremental load finished in {elapsed:.1f}s: {counts['added']:,} added, "
+              f"{counts['changed']:,} changed, {counts['removed']:,} removed, "
+              f"{counts['unchanged']:,} unchanged")
+        return counts
+
+    except Exception as e:
+        print(f"An error occurred during incremental load: {e}")
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        return False
+    finally:
+        _apply_pragmas(conn, previous)
+        print("Closing database connection.")
+        conn.close()
+
+
+def builds_dir(db_path=None):
+    """The directory holding the versioned builds of `db_path`."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path or DB_PATH)), BUILDS_DIR)
+
+
+def _read_only(path):
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+
+def _remove_database(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def start_build(db_path=None, copy_current=False):
+    """
+    Creates the database file for a new build of `db_path`.
+
+    The build continues the live database's generation, so build_catalog gives
+    it the next number and caches keyed on the generation are invalidated when
+    it is published.
+
+    Args:
+        db_path (str, optional): The live database path. Uses DB_PATH if not provided.
+        copy_current (bool): Start from a copy of the live database, taken with the
+            SQLite backup API while it keeps serving reads, e.g. for incremental loads.
+
+    Returns:
+        str: The path of the new build.
+    """
+    db_to_use = db_path if db_path else DB_PATH
+    directory = builds_dir(db_to_use)
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.splitext(os.path.basename(db_to_use))[0]
+    # mkstemp picks a name no other build has, even for builds started within the same second.
+    fd, build_path = tempfile.mkstemp(prefix=f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-", suffix='.db',
+                                      dir=directory)
+    os.close(fd)
+    os.chmod(build_path, 0o644)  # what SQLite itself would create; mkstemp makes it owner-only
+
+    generation = 0
+    conn = sqlite3.connect(build_path)
+    try:
+        if os.path.exists(db_to_use):
+            live = _read_only(db_to_use)
+            try:
+                generation = live.execute('PRAGMA user_version').fetchone()[0]
+                if copy_current:
+                    print(f"Copying {db_to_use} to {build_path}...")
+                    live.backup(conn)
+            finally:
+                live.close()
+        conn.execute(f'PRAGMA user_version = {generation}')
+    finally:
+        conn.close()
+    return build_path
+
+
+def _quick_check(conn):
+    """
+    Runs PRAGMA quick_check and returns its findings, empty if the file is sound.
+
+    Some SQLite releases (seen on 3.40.1) report 'NULL value in T.C' for a NOT
+    NULL column of a WITHOUT ROWID table, such as company_sic.sic_code, that
+    holds no NULLs. Those reports are checked against the table and dropped
+    when no NULL is there.
+    """
+    findings = []
+    for (message,) in conn.execute('PRAGMA quick_check'):
+        if message == 'ok':
+            continue
+        match = _NULL_VALUE.match(message)
+        # typeof() keeps the planner from folding the test away for a NOT NULL column.
+        if match and conn.execute(f'SELECT 1 FROM "{match.group(1)}" WHERE typeof("{match.group(2)}") = \'null\' '
+                                  'LIMIT 1').fetchone() is None:
+            continue
+        findings.append(message)
+    return list(dict.fromkeys(findings))
+
+
+def validate_build(build_path, quick_check=False):
+    """
+    Checks that a build is complete enough to serve: the companies table,
+    catalog, derived tables and indexes exist, the table is not empty and the
+    canned queries compile.
+
+    Args:
+        build_path (str): The build to check.
+        quick_check (bool): Also run PRAGMA quick_check, which reads the whole file.
+
+    Returns:
+        list[str]: Problems found; empty if the build is valid.
+    """
+    problems = []
+    conn = _read_only(build_path)
+    try:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
+        problems += [f"missing {name}" for name in ['companies', 'db_catalog', *DERIVED_TABLES, *INDEXES]
+                     if name not in names]
+        if problems:
+            return problems
+        row = conn.execute("SELECT value FROM db_catalog WHERE key = 'row_count'").fetchone()
+        if not row or not json.loads(row[0]):
+            problems.append("companies is empty")
+        for query in SqlQuery:
+            if '?' in query.value:
+                continue
+            try:
+                conn.execute(f"EXPLAIN {query.value}")
+            except sqlite3.Error as e:
+                problems.append(f"{query.name} does not compile: {e}")
+        if quick_check:
+            findings = _quick_check(conn)
+            if findings:
+                problems.append(f"quick_check: {'; '.join(findings[:5])}")
+    finally:
+        conn.close()
+    return problems
+
+
+def publish_build(build_path, db_path=None):
+    """
+    Atomically points `db_path` at `build_path` by replacing the symlink.
+
+    Connection pools notice the new target on their next checkout and drain
+    the old one (see db_pool.get_pool). A database still stored as a regular
+    file at `db_path` is checkpointed and moved into the builds directory first.
+
+    Raises:
+        RuntimeError: If that checkpoint cannot complete, e.g. because readers
+            keep the WAL busy. Nothing is moved or switched in that case.
+    """
+    db_to_use = db_path if db_path else DB_PATH
+    ensure_wal(build_path)
+    if os.path.exists(db_to_use) and not os.path.islink(db_to_use):
+        # The busy handler waits for readers on older snapshots to move on.
+        conn = sqlite3.connect(db_to_use, timeout=CHECKPOINT_TIMEOUT)
+        try:
+            busy, log_frames, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        finally:
+            conn.close()
+        # Its WAL is deleted below, so every committed frame must be in the main file by now.
+        if busy or log_frames != checkpointed:
+            raise RuntimeError(f"could not checkpoint {db_to_use} ({checkpointed} of {log_frames} WAL frames "
+                               f"copied, busy={busy}); retry when its readers are idle")
+        name = os.path.splitext(os.path.basename(db_to_use))[0]
+        legacy_path = os.path.join(builds_dir(db_to_use), f"{name}-legacy-{time.strftime('%Y%m%d-%H%M%S')}.db")
+        os.replace(db_to_use, legacy_path)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(db_to_use + suffix):
+                os.remove(db_to_use + suffix)
+
+    link_path = f"{db_to_use}.{os.getpid()}.link"
+    os.symlink(os.path.relpath(build_path, os.path.dirname(os.path.abspath(db_to_use))), link_path)
+    os.replace(link_path, db_to_use)
+    print(f"{db_to_use} now points to {build_path}")
+
+
+def prune_builds(db_path=None, keep=KEEP_BUILDS):
+    """Deletes all but the current build and the `keep` most recent others."""
+    db_to_use = db_path if db_path else DB_PATH
+    current = os.path.realpath(db_to_use)
+    directory = builds_dir(db_to_use)
+    builds = sorted((os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.db')),
+                    key=os.path.getmtime, reverse=True)
+    for path in [path for path in builds if os.path.realpath(path) != current][keep:]:
+        print(f"Removing old build {path}")
+        _remove_database(path)
+
+
+def import_build(load, db_path=None, copy_current=False, quick_check=False):
+    """
+    Runs an import against a new build and publishes it if it validates.
+
+    Args:
+        load (callable): Called with the build path; returns a falsy value on failure,
+            e.g. lambda path: bulk_load(csv_path, path).
+        db_path (str, optional): The live database path. Uses DB_PATH if not provided.
+        copy_current (bool): Start the build from a copy of the live database.
+        quick_check (bool): Run PRAGMA quick_check as part of validation.
+
+    Returns:
+        The result of `load`, or False if the build was not published. The live
+        database is left untouched in that case.
+    """
+    db_to_use = db_path if db_path else DB_PATH
+    build_path = start_build(db_to_use, copy_current)
+    published = False
+    try:
+        result = load(build_path)
+        if not result:
+            print(f"Import failed, {db_to_use} is unchanged.")
+            return result
+        problems = validate_build(build_path, quick_check)
+        if problems:
+            print(f"Build {build_path} failed validation, {db_to_use} is unchanged:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return False
+        try:
+            publish_build(build_path, db_to_use)
+        except RuntimeError as e:
+            print(f"Could not switch {db_to_use} to {build_path}: {e}")
+            return False
+        published = True
+        prune_builds(db_to_use)
+        return result
+    finally:
+        if not published:
+            _remove_database(build_path)
+
+
+def fts_match_expression(text: str, columns=None) -> str:
+    """
+    Builds an FTS5 MATCH expression that finds `text` as a phrase, optionally
+    restricted to some companies_fts columns.
+
+    Args:
+        text (str): Free text such as 'Suffolk' or 'Bury St Edmunds'.
+        columns (list[str], optional): companies_fts columns to search. All columns if omitted.
+
+    Returns:
+        str: An expression such as '{RegAddressCounty RegAddressPostTown} : "suffolk"'.
+    """
+    phrase = '"' + text.strip().replace('"', '""') + '"'
+    if not columns:
+        return phrase
+    return '{' + ' '.join(columns) + '} : ' + phrase
+
+
+def search_companies(text: str, columns=None, limit: int = 20, return_json: bool = False) -> Union[pd.DataFrame, str]:
+    """
+    Full-text search over company names and registered addresses via companies_fts.
+
+    Args:
+        text (str): The phrase to search for.
+        columns (str | list[str], optional): 'name', 'address' (see FTS_COLUMNS) or a
+            list of companies_fts columns. Searches everything if omitted.
+        limit (int): Maximum number of rows to return.
+        return_json (bool): Return a JSON string instead of a DataFrame.
+
+    Returns:
+        Union[pd.DataFrame, str]: Matching companies, best matches first.
+    """
+    if isinstance(columns, str):
+        columns = FTS_COLUMNS[columns]
+    return query_companies_table(SqlQuery.FTS_SEARCH.value, return_json=return_json,
+                                 params=(fts_match_expression(text, columns), limit))
+
+
+def query_companies_table(sql: str, return_json: bool = True, params=None, db_path=None,
+                          max_rows=MAX_ROWS, time_budget=TIME_BUDGET) -> Union[pd.DataFrame, str]:
     """
     Execute a SQL query against the companies database and return results as JSON or DataFrame.
     
     This function provides a safe way to execute read-only queries against the companies table.
-    It includes basic SQL injection protection by only allowing SELECT queries.
+    Queries pass through sql_guard: only a single SELECT statement is allowed, the result is
+    capped at `max_rows`, full scans are flagged or rejected, and execution is stopped once
+    `time_budget` seconds are spent.
     
     Args:
         sql (str): The SQL SELECT query to execute. Should be a read-only query.
         return_json (bool, optional): If True, returns results as JSON string. If False, returns DataFrame.
                                     Defaults to True.
+        params (tuple | dict, optional): Values bound to ? or :name placeholders in `sql`.
+        db_path (str, optional): Path to the SQLite database. Uses DB_PATH if not provided.
+        max_rows (int, optional): Outer row cap. No cap if None.
+        time_budget (float, optional): Seconds of execution allowed. No budget if None.
         
     Returns:
         Union[str, pd.DataFrame]: Query results as JSON string if return_json is True, 
@@ -73,29 +1167,19 @@ def query_companies_table(sql: str, return_json: bool = True) -> Union[pd.DataFr
                                 DataFrame on error.
         
     Raises:
-        ValueError: If the query is not a SELECT statement.
-        sqlite3.Error: For database-related errors.
+        GuardError: If the query is rejected or exceeds its time budget. It is a
+            ValueError, with a `reason` code.
     """
-    # Basic SQL injection protection - only allow SELECT queries
-    if not sql.strip().upper().startswith('SELECT'):
-        raise ValueError("Only SELECT queries are allowed for security reasons.")
-    
-    # Add default LIMIT 10 if not specified
-    sql_upper = sql.upper()
-    if 'LIMIT' not in sql_upper and ';' not in sql_upper:
-        sql = f"{sql.rstrip()} LIMIT 10"
-    
-    print(f"Connecting to database at {DB_PATH}...")
-    conn = None
+    # Single SELECT statements only, with an outer row cap that a LIMIT in a
+    # string literal or a trailing ';' cannot get around.
+    sql = prepare_select(sql, max_rows)
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        
-        # Set a timeout for the database connection
-        conn.execute('PRAGMA busy_timeout = 30000')  # 30 seconds
-        
-        # Execute the query and return results
-        df = pd.read_sql_query(sql, conn)
+        # Borrow a pooled read-only connection (WAL, mmap, query_only, busy_timeout)
+        with get_pool(db_path or DB_PATH).connection() as conn:
+            check_plan(conn, sql, params)
+            with TimeBudget(conn, time_budget):
+                df = pd.read_sql_query(sql, conn, params=params)
         
         # Convert to JSON if requested
         if return_json:
@@ -103,53 +1187,165 @@ def query_companies_table(sql: str, return_json: bool = True) -> Union[pd.DataFr
             return df.to_json(orient='records', date_format='iso')
         return df
         
+    except GuardError:
+        raise
     except sqlite3.Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         return pd.DataFrame()
     except Exception as e:
-        print(f"Unexpected error: {e}")
+        logger.exception("Unexpected error: %s", e)
         return pd.DataFrame()
-    finally:
-        if conn:
-            try:
-                conn.close()
-                print("Database connection closed.")
-            except Exception as e:
-                print(f"Error closing connection: {e}")
+
+
+def iter_query_rows(sql: str, params=None, db_path=None, batch_size: int = 1000,
+                    max_rows=MAX_ROWS, time_budget=TIME_BUDGET):
+    """
+    Runs a query and yields its rows one dict at a time, fetching from the
+    SQLite cursor in batches so memory stays constant however large the result.
+
+    The query passes through the same guard as query_companies_table. The time
+    budget only counts time spent in SQLite, not time the consumer spends
+    between rows. The pooled connection is held until the generator is
+    exhausted or closed.
+
+    Args:
+        sql (str): The SQL SELECT query to execute.
+        params (tuple | dict, optional): Values bound to ? or :name placeholders in `sql`.
+        db_path (str, optional): Path to the SQLite database. Uses DB_PATH if not provided.
+        batch_size (int): Rows fetched from the cursor per round trip.
+        max_rows (int, optional): Outer row cap. No cap if None.
+        time_budget (float, optional): Seconds of execution allowed. No budget if None.
+
+    Yields:
+        dict: One row, keyed by column name.
+
+    Raises:
+        GuardError: If the query is rejected or exceeds its time budget.
+        sqlite3.Error: For database-related errors.
+    """
+    sql = prepare_select(sql, max_rows)
+    with get_pool(db_path or DB_PATH).connection() as conn:
+        check_plan(conn, sql, params)
+        budget = TimeBudget(conn, time_budget)
+        with budget:
+            cursor = conn.execute(sql, params or ())
+        try:
+            columns = [description[0] for description in cursor.description]
+            while True:
+                with budget:
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            cursor.close()
+
+
+async def fetch_rows_async(sql: str, params=None, db_path=None) -> list:
+    """Runs a query on the query thread pool and returns its rows as a list of dicts."""
+    return await run_in_executor(lambda: list(iter_query_rows(sql, params, db_path)))
+
+
+def query_columns(sql: str, params=None, db_path=None) -> list:
+    """
+    Returns the result column names of a query without running it.
+
+    Raises:
+        GuardError: If the query is not a single SELECT, or with reason
+            'invalid_sql' if SQLite cannot compile it.
+    """
+    with get_pool(db_path or DB_PATH).connection() as conn:
+        try:
+            cursor = conn.execute(prepare_select(sql, max_rows=0), params or ())
+        except sqlite3.Error as e:
+            raise GuardError('invalid_sql', f"Invalid SQL: {e}") from None
+        return [description[0] for description in cursor.description]
+
+
+def keyset_pageable(sql: str) -> bool:
+    """
+    Whether keyset_query can page `sql` without changing its meaning.
+
+    That is the case when the query has no ORDER BY or LIMIT of its own, or is
+    already ordered by CompanyNumber. A query ordered on anything else, or a
+    top-N, must keep its own order and is not paged.
+    """
+    statement = _STRING_LITERAL.sub("''", ' '.join(split_statements(sql)))
+    # Subqueries, window definitions and function calls may order and limit freely.
+    previous = None
+    while previous != statement:
+        previous, statement = statement, _PARENTHESIZED.sub(' ', statement)
+    order_by = _ORDER_BY.search(statement)
+    if order_by:
+        return bool(_KEYSET_ORDER.match(order_by.group(1).strip()))
+    return not _LIMIT_CLAUSE.search(statement)
+
+
+def keyset_query(sql: str, params=None, after=None, limit=None):
+    """
+    Wraps a query for keyset pagination on CompanyNumber.
+
+    The query's own result set is walked in CompanyNumber order, starting after
+    the `after` cursor, so each page costs the same however deep it is. The
+    query must select CompanyNumber and be keyset_pageable.
+
+    Args:
+        sql (str): The SQL SELECT query to paginate.
+        params (tuple | dict, optional): The query's parameters.
+        after (str, optional): The last CompanyNumber of the previous page.
+        limit (int, optional): Page size. No limit if omitted.
+
+    Returns:
+        tuple[str, tuple | dict]: The paginated SQL and its parameters.
+    """
+    named = isinstance(params, dict)
+    params = dict(params) if named else list(params or ())
+    inner = sql.strip().rstrip(';')
+    page_sql = f"SELECT * FROM ({inner}) AS page"
+    if after is not None:
+        page_sql += " WHERE CompanyNumber > " + (":_after" if named else "?")
+        if named:
+            params['_after'] = after
+        else:
+            params.append(after)
+    page_sql += " ORDER BY CompanyNumber"
+    if limit is not None:
+        page_sql += " LIMIT " + (":_page_size" if named else "?")
+        if named:
+            params['_page_size'] = limit
+        else:
+            params.append(limit)
+    return page_sql, params if named else tuple(params)
 
 
 def create_indexes(db_path=None):
     """
-    Creates indexes on the companies table to improve query performance.
+    Creates indexes on the companies table to improve query performance,
+    rebuilds the lookup tables derived from it (see DERIVED_TABLES) and
+    refreshes the catalog.
     
     Args:
         db_path (str, optional): Path to the SQLite database. Uses DB_PATH if not provided.
+
+    Returns:
+        bool: True if the indexes were created.
     """
     db_to_use = db_path if db_path else DB_PATH
     print(f"Connecting to database at {db_to_use} to create indexes...")
     conn = sqlite3.connect(db_to_use)
-    cursor = conn.cursor()
-
-    indexes_to_create = {
-        'idx_company_status': 'CREATE INDEX IF NOT EXISTS idx_company_status ON companies (CompanyStatus);',
-        'idx_accounts_category': 'CREATE INDEX IF NOT EXISTS idx_accounts_category ON companies (AccountsAccountCategory);',
-        'idx_reg_address_county': 'CREATE INDEX IF NOT EXISTS idx_reg_address_county ON companies (UPPER(RegAddressCounty));',
-        'idx_accounts_due_date': 'CREATE INDEX IF NOT EXISTS idx_accounts_due_date ON companies (AccountsNextDueDate);',
-        'idx_sic_code_1': 'CREATE INDEX IF NOT EXISTS idx_sic_code_1 ON companies (SICCodeSicText_1);',
-        'idx_sic_code_2': 'CREATE INDEX IF NOT EXISTS idx_sic_code_2 ON companies (SICCodeSicText_2);',
-        'idx_sic_code_3': 'CREATE INDEX IF NOT EXISTS idx_sic_code_3 ON companies (SICCodeSicText_3);',
-        'idx_sic_code_4': 'CREATE INDEX IF NOT EXISTS idx_sic_code_4 ON companies (SICCodeSicText_4);'
-    }
 
     try:
-        for name, sql in indexes_to_create.items():
-            print(f"Creating index {name}...")
-            cursor.execute(sql)
+        _create_indexes(conn)
+        _rebuild_derived_tables(conn)
+        build_catalog(conn)
         conn.commit()
         print("Indexes created successfully.")
+        return True
 
     except Exception as e:
         print(f"An error occurred while creating indexes: {e}")
+        return False
     finally:
         print("Closing database connection.")
         conn.close()
@@ -160,31 +1356,174 @@ class SqlQuery(Enum):
     ACTIVE_COMPANIES = "SELECT CompanyName, CompanyNumber, CompanyStatus FROM companies WHERE CompanyStatus = 'Active' ORDER BY CompanyName LIMIT 20;"
     LIQUID_COMPANIES = "SELECT CompanyName, CompanyNumber, CompanyStatus FROM companies WHERE CompanyStatus = 'Liquidation' LIMIT 20;"
     MICRO_ENTITY = "SELECT CompanyName, CompanyNumber, AccountsAccountCategory FROM companies WHERE AccountsAccountCategory = 'MICRO ENTITY' LIMIT 20;"
-    SCHEMA = "PRAGMA table_info(companies);"
-    COMPANY_CAT = "SELECT DISTINCT CompanyCategory FROM companies;"
-    ACCOUNTS_CAT = "SELECT DISTINCT AccountsAccountCategory FROM companies;"
-    COUNTIES = "SELECT DISTINCT RegAddressCounty FROM companies;"
-    COMPANIES_IN_SUFFOLK = "SELECT CompanyName, CompanyNumber, RegAddressCounty FROM companies WHERE UPPER(RegAddressCounty) LIKE '%SUFFOLK%' LIMIT 20;"
-    ACCOUNTS_DUE_NEXT_MONTH = "SELECT CompanyName, CompanyNumber, AccountsNextDueDate FROM companies WHERE date(AccountsNextDueDate) BETWEEN date('now') AND date('now', '+1 month') ORDER BY AccountsNextDueDate LIMIT 20;"
-    PLUMBING_HEAT_AC_COMPANIES = "SELECT CompanyName, CompanyNumber, SICCodeSicText_1 FROM companies WHERE SICCodeSicText_1 LIKE '%43220%' OR SICCodeSicText_2 LIKE '%43220%' OR SICCodeSicText_3 LIKE '%43220%' OR SICCodeSicText_4 LIKE '%43220%' LIMIT 20;"
+    SCHEMA = "SELECT name, type FROM pragma_table_info('companies');"
+    COMPANY_CAT = "SELECT NULLIF(CompanyCategory, '') AS CompanyCategory FROM agg_company_counts GROUP BY CompanyCategory;"
+    ACCOUNTS_CAT = "SELECT NULLIF(AccountsAccountCategory, '') AS AccountsAccountCategory FROM agg_company_counts GROUP BY AccountsAccountCategory;"
+    COUNTIES = "SELECT NULLIF(RegAddressCounty, '') AS RegAddressCounty FROM agg_company_counts GROUP BY RegAddressCounty;"
+    COMPANIES_IN_SUFFOLK = "SELECT c.CompanyName, c.CompanyNumber, c.RegAddressCounty FROM companies_fts JOIN companies c ON c.rowid = companies_fts.rowid WHERE companies_fts MATCH '{RegAddressCounty RegAddressPostTown} : \"suffolk\"' LIMIT 20;"
+    ACCOUNTS_DUE_NEXT_MONTH = "SELECT CompanyName, CompanyNumber, AccountsNextDueDate FROM companies WHERE AccountsNextDueDate BETWEEN date('now') AND date('now', '+1 month') ORDER BY AccountsNextDueDate LIMIT 20;"
+    FTS_SEARCH = "SELECT c.CompanyName, c.CompanyNumber, c.CompanyStatus, c.RegAddressAddressLine1, c.RegAddressPostTown, c.RegAddressCounty, c.RegAddressPostCode FROM companies_fts JOIN companies c ON c.rowid = companies_fts.rowid WHERE companies_fts MATCH ? ORDER BY companies_fts.rank LIMIT ?;"
+    PLUMBING_HEAT_AC_COMPANIES = "SELECT CompanyName, CompanyNumber, SICCodeSicText_1 FROM companies WHERE CompanyNumber IN (SELECT company_number FROM company_sic WHERE sic_code = '43220') LIMIT 20;"
+
+class SqlTemplate(Enum):
+    """
+    Parameterized building blocks for the common question shapes covered by
+    SqlQuery, combined by build_template_query. Placeholders are bound, never
+    interpolated.
+    """
+    SELECT = "SELECT c.CompanyName, c.CompanyNumber, c.CompanyStatus, c.CompanyCategory, c.RegAddressPostCode, c.RegAddressCounty, c.RegAddressPostTown, c.AccountsAccountCategory, c.AccountsNextDueDate"
+    SELECT_SIC = ", c.SICCodeSicText_1, c.SICCodeSicText_2, c.SICCodeSicText_3, c.SICCodeSicText_4"
+    FROM = " FROM companies c"
+    STATUS = "c.CompanyStatus = :status"
+    ACCOUNTS_CATEGORY = "c.AccountsAccountCategory = :accounts_category"
+    COUNTY = "UPPER(c.RegAddressCounty) = UPPER(:county)"
+    DUE_WITHIN = "c.AccountsNextDueDate BETWEEN date('now') AND date('now', :due_window)"
+    SIC_CODE = "c.CompanyNumber IN (SELECT company_number FROM company_sic WHERE sic_code = :sic_code)"
+    ORDER_BY_DUE = " ORDER BY c.AccountsNextDueDate"
+    LIMIT = " LIMIT :limit"
+
+
+def build_template_query(slots: dict, limit: int = 20):
+    """
+    Builds a bound-parameter company search from matched question slots.
+
+    Args:
+        slots (dict): Any of 'status', 'accounts_category', 'county' (matched
+            exactly, ignoring case), 'due_window' (an SQLite date modifier such
+            as '+1 month') and 'sic_code'.
+        limit (int, optional): Maximum number of rows. No limit if None, e.g. when
+            the query is paginated with keyset_query.
+
+    Returns:
+        tuple[str, dict]: The SQL and its parameters.
+    """
+    sql = SqlTemplate.SELECT.value
+    if 'sic_code' in slots:
+        sql += SqlTemplate.SELECT_SIC.value
+    sql += SqlTemplate.FROM.value
+
+    params = {}
+    conditions = []
+    for slot, template in (('status', SqlTemplate.STATUS), ('accounts_category', SqlTemplate.ACCOUNTS_CATEGORY),
+                           ('county', SqlTemplate.COUNTY), ('due_window', SqlTemplate.DUE_WITHIN),
+                           ('sic_code', SqlTemplate.SIC_CODE)):
+        if slot in slots:
+            conditions.append(template.value)
+            params[slot] = slots[slot]
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if 'due_window' in slots:
+        sql += SqlTemplate.ORDER_BY_DUE.value
+    if limit is not None:
+        sql += SqlTemplate.LIMIT.value
+        params['limit'] = limit
+    return sql, params
+
+
+def build_aggregate_query(slots: dict):
+    """
+    Builds a count or breakdown query over the summary tables (agg_*) for the
+    slots of a count question, e.g. "how many micro entities are in
+    liquidation" or "companies by county".
+
+    Company counts can be filtered by status, accounts category and county (an
+    exact, case-insensitive match on RegAddressCounty, the same rule as
+    build_template_query, so a count agrees with its list) and grouped by one of
+    AGGREGATE_GROUPS. SIC code counts and the accounts due month histogram
+    cannot be combined with other filters.
+
+    Args:
+        slots (dict): Slots from intent_matcher.match_question, with an optional
+            'group_by' of AGGREGATE_GROUPS, 'sic_code' or 'due_month'.
+
+    Returns:
+        tuple[str, dict] | None: The SQL and its parameters, or None if the
+            summary tables cannot answer the question.
+    """
+    group_by = slots.get('group_by')
+    filters = {slot: slots[slot] for slot in ('status', 'accounts_category', 'county', 'sic_code', 'due_window')
+               if slot in slots}
+
+    if group_by == 'sic_code' or 'sic_code' in filters:
+        if group_by not in (None, 'sic_code') or set(filters) - {'sic_code'}:
+            return None
+        if 'sic_code' in filters:
+            return "SELECT sic_code, n AS company_count FROM agg_sic_counts WHERE sic_code = :sic_code", filters
+        return "SELECT sic_code, n AS company_count FROM agg_sic_counts ORDER BY n DESC", {}
+
+    if group_by == 'due_month':
+        if filters:
+            return None
+        return ("SELECT NULLIF(due_month, '') AS due_month, n AS company_count FROM agg_accounts_due_months "
+                "ORDER BY due_month", {})
+
+    # The histogram has month granularity; exact due windows need the companies table.
+    if 'due_window' in filters or (group_by is not None and group_by not in AGGREGATE_GROUPS):
+        return None
+
+    conditions = []
+    if 'status' in filters:
+        conditions.append("CompanyStatus = :status")
+    if 'accounts_category' in filters:
+        conditions.append("AccountsAccountCategory = :accounts_category")
+    if 'county' in filters:
+        conditions.append("UPPER(RegAddressCounty) = UPPER(:county)")
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    if group_by is None:
+        return f"SELECT coalesce(SUM(n), 0) AS company_count FROM agg_company_counts{where}", filters
+    column = AGGREGATE_GROUPS[group_by]
+    return (f"SELECT NULLIF({column}, '') AS {column}, SUM(n) AS company_count FROM agg_company_counts{where} "
+            f"GROUP BY {column} ORDER BY company_count DESC", filters)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='A tool to import company data to SQLite and query it.')
     parser.add_argument('action', choices=['import', 'query', 'index'], help='The action to perform: import, query, or index.')
     parser.add_argument('--query_name', type=str, choices=[q.name for q in SqlQuery], help='The name of the query to execute.')
-    parser.add_argument('--csv_path', type=str, help='Path to the CSV file for import.')
+    parser.add_argument('--csv_path', type=str, nargs='+', help='Path(s) to the CSV or zip file(s) for import.')
     parser.add_argument('--db_path', type=str, default='companydata/companydata.db', help='Path to the SQLite database file.')
+    parser.add_argument('--bulk', action='store_true', help='Rebuild the table from the sql/ DDL using the bulk-load path.')
+    parser.add_argument('--parts', type=str, help='Glob of part files (CSV or zip) to import in parallel, e.g. "companydata/*.zip".')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of parse processes for --parts.')
+    parser.add_argument('--incremental', action='store_true', help='Only insert, update or delete companies that changed since the last import.')
+    parser.add_argument('--memory_cap_mb', type=int, default=MEMORY_CAP_MB, help='Memory budget in MB for the whole import: SQLite page cache plus parsed batches in flight.')
+    parser.add_argument('--in_place', action='store_true', help='Write to --db_path directly instead of building a new version and switching to it.')
+    parser.add_argument('--quick_check', action='store_true', help='Run PRAGMA quick_check on a new build before switching to it.')
 
     args = parser.parse_args()
 
+    def run_versioned(load, copy_current=False):
+        if args.in_place:
+            # Servers read with WAL; builds get it from publish_build.
+            result = load(args.db_path)
+            if result:
+                ensure_wal(args.db_path)
+            return result
+        return import_build(load, args.db_path, copy_current=copy_current, quick_check=args.quick_check)
+
     if args.action == 'import':
-        if not args.csv_path:
-            print("Error: --csv_path is required for the import action.")
+        part_paths = sorted(glob.glob(args.parts)) if args.parts else args.csv_path
+        workers = args.workers if args.parts else 1
+        if args.parts and not part_paths:
+            print(f"Error: no files match --parts {args.parts}")
+        elif not part_paths:
+            print("Error: --csv_path or --parts is required for the import action.")
+        elif args.incremental:
+            run_versioned(lambda db_path: incremental_load(part_paths, db_path, memory_cap_mb=args.memory_cap_mb,
+                                                           workers=workers), copy_current=True)
+        elif args.parts:
+            print(f"Importing {len(part_paths)} part file(s) with {args.workers} worker(s)...")
+            run_versioned(lambda db_path: bulk_load(part_paths, db_path, memory_cap_mb=args.memory_cap_mb,
+                                                    workers=workers))
         else:
             TABLE_NAME = 'companies'
-            import_success = csv_to_sqlite(args.csv_path, TABLE_NAME)  # Removed db_path as it's a global
-            if import_success:
-                create_indexes(args.db_path)
+            if args.bulk:
+                # bulk_load builds indexes and runs ANALYZE itself
+                run_versioned(lambda db_path: bulk_load(args.csv_path, db_path, memory_cap_mb=args.memory_cap_mb))
+            else:
+                run_versioned(lambda db_path: csv_to_sqlite(args.csv_path, TABLE_NAME, memory_cap_mb=args.memory_cap_mb,
+                                                            db_path=db_path) and create_indexes(db_path))
     
     elif args.action == 'query':
         if not args.query_name:
@@ -193,14 +1532,17 @@ if __name__ == "__main__":
         else:
             sql_to_run = SqlQuery[args.query_name].value
             print(f"Executing query '{args.query_name}': {sql_to_run}")
-            results_df = query_companies_table(args.db_path, sql_to_run)
-            
-            if not results_df.empty:
-                print(f"\nQuery returned {len(results_df)} results:")
-                print(results_df.to_string())
+            try:
+                results_df = query_companies_table(sql_to_run, return_json=False, db_path=args.db_path)
+            except GuardError as e:
+                print(f"Query rejected ({e.reason}): {e}")
             else:
-                print(f"\nQuery returned no results.")
+                if not results_df.empty:
+                    print(f"\nQuery returned {len(results_df)} results:")
+                    print(results_df.to_string())
+                else:
+                    print(f"\nQuery returned no results.")
 
     elif args.action == 'index':
         print(f"Creating indexes on the database at {args.db_path}...")
-        create_indexes(args.db_path)
+        run_versioned(create_indexes, copy_current=True)
@@ -0,0 +1,143 @@
+import re
+
+# Words that carry no filter meaning in the question shapes the templates cover.
+FILLER_WORDS = {
+    'a', 'all', 'an', 'and', 'any', 'are', 'based', 'businesses', 'by', 'companies', 'company',
+    'county', 'find', 'firms', 'for', 'from', 'get', 'give', 'in', 'is', 'list', 'located', 'me',
+    'of', 'please', 'registered', 'results', 'show', 'status', 'that', 'the', 'their', 'those',
+    'to', 'where', 'which', 'whose', 'with',
+}
+# Extra words allowed once the matching slot has been found.
+SLOT_WORDS = {
+    'accounts_category': {'accounts', 'account', 'category', 'filing'},
+    'due_window': {'accounts', 'account', 'are', 'due'},
+    'sic_code': {'sic', 'code', 'codes', 'industry', 'involved', 'activity', 'activities', 'business'},
+}
+
+# Words that make a question a count, answered from the summary tables.
+AGGREGATE_WORDS = {'how', 'many', 'count', 'number', 'total', 'totals', 'breakdown', 'split', 'there', 'have', 'has'}
+# Group-by phrases of breakdown questions and the slot value they map to.
+GROUP_BY_WORDS = {
+    'county': 'county', 'counties': 'county', 'status': 'status', 'statuses': 'status',
+    'company category': 'company_category', 'company categories': 'company_category',
+    'category': 'company_category', 'categories': 'company_category',
+    'accounts category': 'accounts_category', 'account category': 'accounts_category',
+    'accounts categories': 'accounts_category',
+    'sic code': 'sic_code', 'sic codes': 'sic_code', 'industry': 'sic_code', 'industries': 'sic_code',
+    'due month': 'due_month', 'accounts due month': 'due_month',
+}
+
+NUMBER_WORDS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'six': 6, 'twelve': 12}
+
+_LIMIT = re.compile(r'\((?:limit to )?(\d+) results?\)|\b(?:top|first|limit(?: to)?)\s+(\d+)\b')
+_DUE = re.compile(r'\bdue\s+(?:with)?in\s+(?:the\s+)?(?:next\s+)?'
+                  r'(\d+|a|an|one|two|three|four|six|twelve)?\s*(day|week|month|year)s?\b'
+                  r'|\bdue\s+(?:in\s+the\s+)?next\s+(day|week|month|year)\b')
+_SIC_CODE = re.compile(r'\b(\d{5})\b')
+_AGGREGATE = re.compile(r'\bhow many\b|\bcount\b|\bnumber of\b|\btotals?\b|\bbreakdown\b')
+_GROUP_BY = re.compile(r'\b(?:by|per|for each|in each|across)\s+(' +
+                       '|'.join(sorted(GROUP_BY_WORDS, key=len, reverse=True)) + r')\b')
+MAX_COUNTY_WORDS = 4
+
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _cut(text, match):
+    """Blanks out a matched span so its words are not matched or counted again."""
+    return text[:match.start()] + ' ' + text[match.end():]
+
+
+def _match_value(text, values):
+    """Finds the longest catalog value that appears as a phrase in `text`."""
+    for value in sorted(values, key=len, reverse=True):
+        pattern = r'\b' + r'\s+'.join(re.escape(word) for word in _tokens(value)) + r'\b'
+        match = re.search(pattern, text) if _tokens(value) else None
+        if match:
+            return value, match
+    return None, None
+
+
+def match_question(question, catalog):
+    """
+    Matches a natural-language question against the template slots.
+
+    Recognizes a company status, an accounts category, a registered county, an
+    accounts-due window and a SIC code, using the values recorded in the
+    database catalog. Count questions ("how many ...") and breakdowns ("... by
+    county") also set 'aggregate' and an optional 'group_by' slot, see
+    file_to_db.build_aggregate_query. The match only succeeds if every
+    meaningful word of the question is explained by a slot, so anything the
+    templates cannot express is left to the LLM.
+
+    Args:
+        question (str): The user's question.
+        catalog (dict): The database catalog, see file_to_db.load_catalog.
+
+    Returns:
+        tuple[dict, int | None] | None: The slots for file_to_db.build_template_query
+            and the requested row limit, or None if the question does not fit.
+    """
+    text = ' ' + question.lower().replace('entities', 'entity') + ' '
+    slots = {}
+    allowed = set()
+
+    limit = None
+    match = _LIMIT.search(text)
+    if match:
+        limit = int(match.group(1) or match.group(2))
+        text = _cut(text, match)
+
+    match = _GROUP_BY.search(text)
+    if match:
+        slots['group_by'] = GROUP_BY_WORDS[match.group(1)]
+        slots['aggregate'] = True
+        text = _cut(text, match)
+    match = _DUE.search(text)
+    if match:
+        count = match.group(1)
+        unit = match.group(2) or match.group(3)
+        n = int(count) if count and count.isdigit() else NUMBER_WORDS.get(count, 1)
+        if unit == 'week':
+            n, unit = n * 7, 'day'
+        slots['due_window'] = f'+{n} {unit}s'
+        text = _cut(text, match)
+
+    if 'sic' in text:
+        match = _SIC_CODE.search(text)
+        if match:
+            code = match.group(1)
+            slots['sic_code'] = code
+            allowed |= set(_tokens(catalog.get('sic_codes', {}).get(code, '')))
+            text = _cut(text, match)
+
+    distinct_values = catalog.get('distinct_values', {})
+    for slot, column in (('status', 'CompanyStatus'), ('accounts_category', 'AccountsAccountCategory')):
+        value, match = _match_value(text, distinct_values.get(column, []))
+        if value:
+            slots[slot] = value
+            text = _cut(text, match)
+
+    # After the catalog values are cut out, so 'TOTAL EXEMPTION FULL' stays a category.
+    match = _AGGREGATE.search(text)
+    if match:
+        slots['aggregate'] = True
+        allowed |= AGGREGATE_WORDS
+
+    counties = set(catalog.get('counties', []))
+    words = _tokens(text)
+    for size in range(MAX_COUNTY_WORDS, 0, -1):
+        candidates = (' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+        county = next((c for c in candidates if c.upper() in counties), None)
+        if county:
+            slots['county'] = county
+            text = text.replace(county, ' ', 1)
+            break
+
+    for slot in slots:
+        allowed |= SLOT_WORDS.get(slot, set())
+    leftover = [word for word in _tokens(text) if word not in FILLER_WORDS and word not in allowed]
+    if not slots or leftover:
+        return None
+    return slots, limit
@@ -0,0 +1,162 @@
+import os
+import random
+import asyncio
+import logging
+from anthropic import AsyncAnthropic, APIConnectionError, APIStatusError
+
+MODEL = "claude-3-5-sonnet-20240620"
+
+# Upstream calls allowed at once; further callers wait on the semaphore.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 8))
+# Seconds for a single upstream attempt, and for the whole call including retries and queueing.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_TOTAL_TIMEOUT = float(os.getenv("LLM_TOTAL_TIMEOUT", 90))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+# Rate limits, overload and transient server errors are worth another attempt.
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same result (or exception) instead of repeating it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _, key=key: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller giving up does not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+
+def _retry_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter, honouring a server Retry-After hint."""
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LLMClient:
+    """
+    Async Anthropic client with request coalescing, a concurrency limit,
+    timeouts and jittered retries.
+
+    The base URL comes from ANTHROPIC_BASE_URL when set, so the client can be
+    pointed at a local fake model server.
+    """
+
+    def __init__(self, api_key, base_url=None, model=MODEL, concurrency=LLM_CONCURRENCY,
+                 timeout=LLM_TIMEOUT, total_timeout=LLM_TOTAL_TIMEOUT, max_retries=LLM_MAX_RETRIES):
+        self.model = model
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        # Retries are done here, with jitter, rather than inside the SDK.
+        self._client = AsyncAnthropic(api_key=api_key, base_url=base_url or os.getenv("ANTHROPIC_BASE_URL"),
+                                      timeout=timeout, max_retries=0)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._flight = SingleFlight()
+        self.concurrency = concurrency
+        self.waiting = 0
+        self.active = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def _create(self, system, prompt, max_tokens):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self.calls += 1
+                    response = await self._client.messages.create(
+                        model=self.model,
+                        max_tokens=max_tokens,
+                        system=system,
+                        messages=[{"role": "user", "content": prompt}],
+                    )
+                    return response.content[0].text
+                except (APIConnectionError, APIStatusError) as e:
+                    retryable = (isinstance(e, APIConnectionError) or
+                                 e.status_code in RETRY_STATUS_CODES)
+                    if not retryable or attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    delay = _retry_delay(attempt, _retry_after(e))
+                    logger.warning("LLM call failed (%s), retrying in %.2fs", e.__class__.__name__, delay)
+                    await asyncio.sleep(delay)
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def _complete(self, system, prompt, max_tokens):
+        try:
+            return await asyncio.wait_for(self._create(system, prompt, max_tokens), self.total_timeout)
+        except Exception:
+            self.failures += 1
+            raise
+
+    async def complete(self, system, prompt, key=None, max_tokens=500):
+        """
+        Sends one user message and returns the text of the reply.
+
+        Args:
+            system (str): The system prompt.
+            prompt (str): The user message.
+            key (hashable, optional): Coalescing key. Concurrent calls with the same
+                key share one upstream request. Defaults to (system, prompt).
+            max_tokens (int): Maximum tokens to generate.
+
+        Raises:
+            asyncio.TimeoutError: If the call, including queueing and retries,
+                exceeds the total timeout.
+            anthropic.APIError: If the last attempt fails.
+        """
+        if key is None:
+            key = (system, prompt)
+        return await self._flight.do(key, self._complete, system, prompt, max_tokens)
+
+    def stats(self):
+        return {
+            'concurrency': self.concurrency,
+            'queue_depth': self.waiting,
+            'active': self.active,
+            'in_flight_keys': self._flight.in_flight,
+            'coalesced': self._flight.coalesced,
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+        }
@@ -1,99 +1,226 @@
 from mcp.server.fastmcp import FastMCP
 import uvicorn
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 import json
-from anthropic import Anthropic
+import time
+import logging
 from datetime import datetime
 import os
-from file_to_db import query_companies_table, SqlQuery
+from file_to_db import (load_catalog, build_template_query, build_aggregate_query, iter_query_rows,
+                        fetch_rows_async, keyset_query, keyset_pageable, query_columns)
+from intent_matcher import match_question
+from db_pool import run_in_executor
+from query_cache import TTLCache, normalize_question
+from sql_guard import GuardError, prepare_select, MAX_ROWS, EXPORT_MAX_ROWS, EXPORT_TIME_BUDGET
+from llm_client import LLMClient
+from metrics import (registry, span, start_request, server_timing, configure_logging, Counter, Gauge,
+                     REQUEST_SECONDS, ROWS_RETURNED, ERRORS)
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
-MODEL = "claude-3-5-sonnet-20240620"
 # Read API key from environment variable
 anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 if not anthropic_api_key:
     raise ValueError("ANTHROPIC_API_KEY environment variable not set.")
 
-anthropic = Anthropic(api_key=anthropic_api_key)
+llm = LLMClient(api_key=anthropic_api_key)
+
+# Row limit for template queries when the question does not ask for one.
+DEFAULT_LIMIT = 20
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Natural-language question -> generated SQL, and (SQL, generation) -> result rows.
+# Both are dropped when a new import bumps the database generation.
+sql_cache = TTLCache("sql", maxsize=int(os.getenv("SQL_CACHE_SIZE", 1024)),
+                     ttl=int(os.getenv("SQL_CACHE_TTL", 24 * 3600)))
+result_cache = TTLCache("result", maxsize=int(os.getenv("RESULT_CACHE_SIZE", 256)),
+                        ttl=int(os.getenv("RESULT_CACHE_TTL", 600)))
+
+# Cache and LLM client counters, read when /metrics is scraped.
+_caches = (sql_cache, result_cache)
+registry.register(Counter('cache_hits_total', 'Cache hits.', ['cache'],
+                          collect=lambda: [({'cache': c.name}, c.stats()['hits']) for c in _caches]))
+registry.register(Counter('cache_misses_total', 'Cache misses.', ['cache'],
+                          collect=lambda: [({'cache': c.name}, c.stats()['misses']) for c in _caches]))
+registry.register(Gauge('cache_hit_ratio', 'Cache hit rate since start.', ['cache'],
+                        collect=lambda: [({'cache': c.name}, c.stats()['hit_rate']) for c in _caches]))
+registry.register(Gauge('cache_entries', 'Entries held by each cache.', ['cache'],
+                        collect=lambda: [({'cache': c.name}, c.stats()['size']) for c in _caches]))
+registry.register(Gauge('llm_queue_depth', 'LLM calls waiting for a concurrency slot.',
+                        collect=lambda: [({}, llm.stats()['queue_depth'])]))
+registry.register(Gauge('llm_active_calls', 'LLM calls in progress.',
+                        collect=lambda: [({}, llm.stats()['active'])]))
+registry.register(Counter('llm_calls_total', 'Upstream LLM requests, including retries.',
+                          collect=lambda: [({}, llm.stats()['calls'])]))
+registry.register(Counter('llm_retries_total', 'LLM requests retried.',
+                          collect=lambda: [({}, llm.stats()['retries'])]))
+registry.register(Counter('llm_coalesced_total', 'Questions that joined an identical in-flight LLM call.',
+                          collect=lambda: [({}, llm.stats()['coalesced'])]))
 
 # Create instances
 mcp = FastMCP("companies")
 app = FastAPI()
 app.router.redirect_slashes = False
 
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Adds a Server-Timing header with the pipeline stages and records request latency."""
+    started = time.perf_counter()
+    spans = start_request()
+    response = await call_next(request)
+    total = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing(spans, total)
+    if request.url.path.startswith("/api/companies"):
+        REQUEST_SECONDS.observe(total, endpoint=request.url.path,
+                                served_by=response.headers.get("X-Served-By", "none"))
+    return response
+
+
 @app.get("/api/companies/search", response_model=dict)
 async def search_companies_with_llm(
     query: str,
-    limit: int = 5,  # Default limit set to 5
-    api_key: str = Header(None, alias="X-API-Key")
+    limit: int = Query(5, ge=1, le=MAX_ROWS),  # Default limit set to 5
+    cursor: str = None,
+    stream: bool = False,
+    api_key: str = Header(None, alias="X-API-Key"),
+    accept: str = Header(None)
 ):
     """Receives a natural language query and uses an LLM to generate and run SQL.
+
+    Results are paged in CompanyNumber order: pass the returned next_cursor back
+    as cursor to fetch the following page. Queries with an order or top-N of
+    their own (e.g. soonest accounts due) return their first page in that
+    order, without a cursor.
     
     Args:
         query: The natural language query to search for companies
-        limit: Maximum number of results to return (default: 5)
+        limit: Maximum number of results per page, 1 to SQL_MAX_ROWS (default: 5)
+        cursor: next_cursor from the previous page, to continue after it
+        stream: Stream every matching row as NDJSON instead of returning one page.
+            Also selected by an Accept: application/x-ndjson header.
         api_key: API key for authentication
     """
-    print(f"Received search request with query: {query}")
+    logger.info("Received search request with query: %s", query)
     
     try:
         # Verify API key
         if api_key != anthropic_api_key:
-            print("Invalid API key provided")
+            logger.warning("Invalid API key provided")
             raise HTTPException(
                 status_code=401,
                 detail="Invalid API key"
             )
 
-        # Add the limit to the query if not already specified
-        if 'limit' not in query.lower() and 'top ' not in query.lower():
-            query = f"{query} (limit to {limit} results)"
-            
-        # Call the new text-to-sql tool
-        data = {"natural_language_query": query}
-        print(f"Calling generate_and_run_sql_query with: {data}")
-        
-        result = await mcp.call_tool("generate_and_run_sql_query", data)
-        print(f"Query result: {result}")
-        
-        if not result or (isinstance(result, dict) and not result.get('result')):
-            print("No results found for the query")
-            return {"result": [], "status": "success", "message": "No results found"}
-            
-        return {"result": result, "status": "success"}
+        if stream or (accept or '').startswith(NDJSON_MEDIA_TYPE):
+            served_by = None
+            try:
+                sql, params, served_by, _ = await plan_question(query, default_limit=None)
+                # Streams run in CompanyNumber order, so a cursor can resume them, unless
+                # the query has an order of its own to keep.
+                if keyset_pageable(sql) and "CompanyNumber" in await run_in_executor(query_columns, sql, params):
+                    sql, params = keyset_query(sql, params, after=cursor)
+                elif cursor is not None:
+                    raise HTTPException(status_code=400, detail="This query keeps its own order and cannot be resumed with a cursor.")
+            except GuardError as e:
+                # Rejected before any row is sent: the same JSON answer as a page request.
+                answer = rejected_answer(e, served_by)
+            else:
+                return StreamingResponse(iter_ndjson(sql, params, served_by), media_type=NDJSON_MEDIA_TYPE,
+                                         headers={"X-Served-By": served_by})
+        else:
+            answer = await answer_question(query, cursor=cursor, page_size=limit)
+        served_by = answer["served_by"] or "none"
+        if "error" in answer:
+            payload = {"result": {"error": answer["error"], "reason": answer.get("reason")}, "status": "success",
+                       "served_by": answer["served_by"]}
+        elif not answer["result"]:
+            payload = {"result": [], "status": "success", "message": "No results found",
+                       "served_by": served_by, "next_cursor": None}
+        else:
+            payload = {"result": answer["result"], "status": "success", "served_by": served_by,
+                       "next_cursor": answer["next_cursor"]}
+
+        with span("serialize"):
+            return JSONResponse(payload, headers={"X-Served-By": served_by})
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in search_companies_with_llm: {str(e)}")
+        logger.exception("Error in search_companies_with_llm")
         raise HTTPException(
             status_code=500,
             detail=f"An error occurred while processing your request: {str(e)}"
         )
 
-def get_db_schema_for_prompt():
-    """Fetches the database schema and formats it for an LLM prompt."""
-    try:
-        schema_df = query_companies_table(sql=SqlQuery.SCHEMA.value)
-        if not schema_df.empty:
-            # Format the schema into a simple string for the prompt
-            return "\n".join([f"- {row['name']} ({row['type']})" for _, row in schema_df.iterrows()])
-        return "Could not retrieve schema."
-    except Exception as e:
-        print(f"Error fetching schema: {e}")
-        return "Error fetching schema."
 
+def rejected_answer(error, served_by):
+    """The answer for a query refused by sql_guard, carrying its reason code."""
+    error_msg = f"Query rejected: {str(error)}"
+    logger.warning("%s (%s)", error_msg, error.reason)
+    ERRORS.inc(reason=error.reason)
+    return {"error": error_msg, "reason": error.reason, "detail": error.as_dict(), "served_by": served_by}
 
-@mcp.tool()
-async def generate_and_run_sql_query(natural_language_query: str):
+
+def iter_ndjson(sql, params, served_by):
     """
-    Takes a natural language query, converts it to SQL using an LLM,
-    executes the SQL against the company database, and returns the result.
+    Encodes rows as newline-delimited JSON as they are read from the cursor.
+    Once streaming has started the status code is already sent, so a failure is
+    reported as a final {"error": ..., "reason": ...} line. The rows sent are
+    recorded when the stream ends, however it ends.
     """
-    print(f"\n=== Processing query: {natural_language_query} ===")
-    
+    rows = 0
     try:
-        schema_info = get_db_schema_for_prompt()
-        print("Fetched database schema")
+        for row in iter_query_rows(sql, params, max_rows=EXPORT_MAX_ROWS, time_budget=EXPORT_TIME_BUDGET):
+            yield json.dumps(row, default=str) + "\n"
+            rows += 1
+    except GuardError as e:
+        logger.warning("Stream stopped: %s (%s)", e, e.reason)
+        ERRORS.inc(reason=e.reason)
+        yield json.dumps({"error": str(e), **e.as_dict()}) + "\n"
+    except Exception as e:
+        logger.exception("Error while streaming results")
+        ERRORS.inc(reason="error")
+        yield json.dumps({"error": str(e), "reason": "error"}) + "\n"
+    finally:
+        ROWS_RETURNED.observe(rows, served_by=served_by)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Latency histograms, cache hit rates and row counts in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/cache/stats", response_model=dict)
+async def cache_stats():
+    """Returns size and hit/miss counters for the SQL and result caches, and LLM queue counters."""
+    return {"sql": sql_cache.stats(), "result": result_cache.stats(), "llm": llm.stats()}
+
+
+# Used when the catalog has no distinct values, e.g. for databases imported before it existed.
+DEFAULT_VALUE_EXAMPLES = {
+    'CompanyStatus': ['Active', 'Liquidation', 'Voluntary', 'Dissolved', 'Admin'],
+    'AccountsAccountCategory': ['MICRO ENTITY', 'SMALL', 'DORMANT'],
+    'CompanyCategory': ['Private Limited Company', 'Private Limited by Shares', 'Private Unlimited Company',
+                        'Public Limited Company', 'Limited Liability Partnership', 'Charitable Company',
+                        'Investment Company'],
+}
+
+_system_prompt = {'generation': None, 'text': None}
 
-        system_prompt = f"""
+
+def build_system_prompt(catalog):
+    """Assembles the text-to-SQL system prompt from the database catalog."""
+    schema_info = "\n".join(f"- {name} ({col_type})" for name, col_type in catalog['columns'])
+    values = catalog.get('distinct_values') or DEFAULT_VALUE_EXAMPLES
+    value_info = "\n".join(f"        - {col} values: " + ", ".join(f"'{v}'" for v in col_values)
+                           for col, col_values in values.items() if col_values)
+    date_info = "\n".join(f"        - {col} ranges from {low} to {high}"
+                          for col, (low, high) in catalog.get('date_ranges', {}).items() if low)
+    return f"""
         You are an expert SQL writer. Your task is to convert a user's natural language question into a valid SQLite query.
         You must only respond with the SQL query and nothing else. Do not add any explanation or markdown formatting.
         
@@ -118,31 +245,26 @@ async def generate_and_run_sql_query(natural_language_query: str):
         {schema_info}
 
         Here are some examples of valid values in the database:
-        - CompanyStatus can be 'Active', 'Liquidation', 'Voluntary', 'Dissolved', 'Admin', etc.
-        - AccountsAccountCategory can be 'MICRO ENTITY', 'SMALL', 'DORMANT', etc.
-        - CompanyCategory common values: 'Private Limited Company', 'Private Limited by Shares', 'Private Unlimited Company', 'Public Limited Company', 'Limited Liability Partnership', 'Charitable Company', 'Investment Company'
-        - For location-based queries, search in these fields:
-            - RegAddressCounty
-            - RegAddressPostTown
-            - RegAddressAddressLine1
-            - RegAddressAddressLine2
-        - Example for Suffolk: 
-          WHERE UPPER(RegAddressCounty) LIKE '%SUFFOLK%' 
-             OR UPPER(RegAddressPostTown) LIKE '%SUFFOLK%'
-             OR UPPER(RegAddressAddressLine1) LIKE '%SUFFOLK%'
-             OR UPPER(RegAddressAddressLine2) LIKE '%SUFFOLK%'
-        - For queries involving strings, use UPPER() and LIKE '%...%' for case-insensitive matching.
-        - For queries involving dates, use SQLite date functions for date comparisons.
-        - AccountsNextDueDate is stored as text in 'YYYY-MM-DD' format.
-        - IncorporationDate is stored as text in 'DD/MM/YYYY' format.
-        - Always handle NULL values with: AccountsNextDueDate IS NOT NULL AND AccountsNextDueDate != ''
-        - To find records within a date range, use: 
-          date(trim(AccountsNextDueDate)) BETWEEN date('now') AND date('now', '+1 month')
-        - Example: 
-          SELECT * FROM companies 
-          WHERE AccountsNextDueDate IS NOT NULL 
-            AND AccountsNextDueDate != ''
-            AND date(trim(AccountsNextDueDate)) BETWEEN date('now') AND date('now', '+1 month')
+{value_info}
+        - For location-based queries (county, town, street, postcode) and company name searches, never use
+          LIKE '%...%'. Use the full-text index companies_fts, whose rowid equals companies.rowid. Its columns are
+          CompanyName, PreviousNames, RegAddressAddressLine1, RegAddressAddressLine2, RegAddressPostTown,
+          RegAddressCounty and RegAddressPostCode. Matching is case-insensitive; quote the search phrase.
+        - Example for Suffolk:
+          SELECT c.CompanyName, c.CompanyNumber, c.RegAddressCounty
+          FROM companies_fts JOIN companies c ON c.rowid = companies_fts.rowid
+          WHERE companies_fts MATCH '{{RegAddressCounty RegAddressPostTown RegAddressAddressLine1 RegAddressAddressLine2}} : "suffolk"'
+        - Example for a company name: WHERE companies_fts MATCH '{{CompanyName PreviousNames}} : "acme"'
+        - Combine other filters on the joined companies table (alias c) in the same WHERE clause.
+        - For other case-insensitive string comparisons, use UPPER(column) = 'VALUE'.
+        - Every date column (IncorporationDate, DissolutionDate, AccountsNextDueDate, AccountsLastMadeUpDate,
+          ReturnsNextDueDate, ReturnsLastMadeUpDate, ConfStmtNextDueDate, ConfStmtLastMadeUpDate and
+          PreviousName_NCONDATE) is stored as ISO text 'YYYY-MM-DD', or NULL when unknown.
+        - Compare date columns directly against date() values so their indexes can be used. Never wrap the
+          column itself in date(), trim() or any other function.
+        - To find records within a date range, use:
+          AccountsNextDueDate BETWEEN date('now') AND date('now', '+1 month')
+{date_info}
 
         When searching for company types:
         1. For private limited companies, use: UPPER(CompanyCategory) LIKE '%PRIVATE%' 
@@ -151,72 +273,194 @@ async def generate_and_run_sql_query(natural_language_query: str):
         4. Always include the exact filter in the WHERE clause that matches the requested company type
         
         For date-based queries:
-        - Use SQLite date functions for date comparisons
-        - AccountsNextDueDate is stored as text in 'YYYY-MM-DD' format
-        - To find records within a date range, use: date(column_name) BETWEEN date('now') AND date('now', '+1 month')
-        - Example: SELECT * FROM companies WHERE date(AccountsNextDueDate) BETWEEN date('now') AND date('now', '+1 month')
+        - Example: SELECT * FROM companies WHERE AccountsNextDueDate BETWEEN date('now') AND date('now', '+1 month')
+        - Example: SELECT * FROM companies WHERE IncorporationDate >= '2020-01-01'
         
         Only use SIC codes if the query specifically asks about business activities or industries.
+
+        For SIC code / industry queries, never use LIKE on the SICCodeSicText_* columns. Use the indexed
+        side table company_sic(company_number, sic_code, position), where sic_code is the 5-digit code as text:
+        - Exact code: WHERE CompanyNumber IN (SELECT company_number FROM company_sic WHERE sic_code = '43220')
+        - Code prefix (e.g. all of division 43): WHERE CompanyNumber IN (SELECT company_number FROM company_sic WHERE sic_code >= '43' AND sic_code < '44')
         
-        Always include ORDER BY and LIMIT clauses to ensure the query returns a manageable number of results.
-        Default to LIMIT 20 if no specific limit is mentioned in the query.
+        For counts and breakdowns, query the summary tables instead of COUNT(*) over companies:
+        - agg_company_counts(CompanyStatus, CompanyCategory, AccountsAccountCategory, RegAddressCounty, n) holds
+          the number of companies n for each combination; unknown values are stored as '' and RegAddressCounty
+          is stored uppercase. Use SUM(n).
+        - agg_sic_counts(sic_code, n) holds the number of companies listing each SIC code.
+        - agg_accounts_due_months(due_month, n) holds the number of companies whose accounts are due in each
+          month, due_month being 'YYYY-MM'.
+        - Example: SELECT SUM(n) AS company_count FROM agg_company_counts WHERE CompanyStatus = 'Liquidation'
+
+        Only add ORDER BY when the question asks for an ordering (e.g. newest, soonest due), and only add LIMIT
+        when it asks for a number of results (e.g. top 10, first 5). Otherwise leave both out: the server caps
+        the result and pages it.
 
         Based on this schema, convert the following user question into a SQLite query.
         """
 
-        print("Sending request to Anthropic API...")
-        response = anthropic.messages.create(
-            model=MODEL,
-            max_tokens=500,
-            system=system_prompt,
-            messages=[
-                {"role": "user", "content": natural_language_query}
-            ]
-        )
-        
-        # Extract the generated SQL query
-        generated_sql = response.content[0].text.strip()
-        print(f"\n=== Generated SQL ===\n{generated_sql}\n")
-        
-        # Basic validation of the generated SQL
-        if not generated_sql.upper().startswith('SELECT'):
-            error_msg = f"Generated query is not a SELECT statement: {generated_sql}"
-            print(f"Error: {error_msg}")
-            return {"error": error_msg}
-
-        print("Executing SQL query...")
-        print(f"SQL Query: {generated_sql}")
-        
-        # Debug: Check date range in the database
-        debug_query = """
-        SELECT 
-            MIN(date(AccountsNextDueDate)) as min_date,
-            MAX(date(AccountsNextDueDate)) as max_date,
-            COUNT(*) as total_companies,
-            COUNT(AccountsNextDueDate) as companies_with_due_date
-        FROM companies
-        WHERE AccountsNextDueDate IS NOT NULL 
-          AND AccountsNextDueDate != ''
-        """
-        print("\n=== Running debug query ===")
-        debug_df = query_companies_table(sql=debug_query, return_json=False)
-        print(f"Date range in database: {debug_df.to_dict('records')}")
-        
-        result_df = query_companies_table(sql=generated_sql, return_json=False)
-        print(f"\nMain query returned {len(result_df)} rows")
-        
-        if not result_df.empty:
-            result = result_df.to_dict('records')
-            print(f"First result: {result[0] if result else 'No results'}")
-            return result
+
+async def get_system_prompt(catalog=None):
+    """Returns the system prompt, rebuilt only when the database generation changes."""
+    if catalog is None:
+        catalog = await run_in_executor(load_catalog)
+    if _system_prompt['generation'] != catalog['generation']:
+        _system_prompt['text'] = build_system_prompt(catalog)
+        _system_prompt['generation'] = catalog['generation']
+    return _system_prompt['text']
+
+
+async def generate_sql(natural_language_query, catalog):
+    """Asks the LLM to translate a question into SQL, using the SQL cache first."""
+    question_key = normalize_question(natural_language_query)
+    generated_sql = sql_cache.get(question_key)
+    if generated_sql is not None:
+        logger.debug("SQL cache hit: %s", generated_sql)
+        return generated_sql, True
+
+    with span("prompt"):
+        system_prompt = await get_system_prompt(catalog)
+    with span("llm"):
+        # Identical questions arriving together share one model call.
+        generated_sql = await llm.complete(system_prompt, natural_language_query,
+                                           key=(question_key, catalog['generation']))
+
+    # Extract the generated SQL query
+    generated_sql = generated_sql.strip()
+    logger.debug("Generated SQL: %s", generated_sql)
+
+    # Only cache a single SELECT that compiles, so a bad answer is asked for again next time.
+    with span("sql_plan"):
+        await run_in_executor(query_columns, generated_sql)
+    sql_cache.set(question_key, generated_sql)
+    return generated_sql, False
+
+
+async def plan_question(natural_language_query: str, default_limit=DEFAULT_LIMIT):
+    """
+    Turns a question into SQL: a bound-parameter template when the question
+    fits one (see intent_matcher), otherwise SQL generated by the LLM.
+
+    Args:
+        natural_language_query: The user's question.
+        default_limit: Row limit for templates when the question names none.
+            None leaves the template query unlimited.
+
+    Returns:
+        tuple: (sql, params, served_by, generation), where served_by is
+            'template', 'llm' or 'sql_cache'.
+    """
+    with span("catalog"):
+        catalog = await run_in_executor(load_catalog)
+    generation = catalog['generation']
+    sql_cache.bind_generation(generation)
+    result_cache.bind_generation(generation)
+
+    with span("match"):
+        matched = match_question(natural_language_query, catalog)
+        query = None
+        if matched:
+            slots, limit = matched
+            if slots.get('aggregate'):
+                # Count questions the summary tables cannot answer go to the LLM.
+                query = build_aggregate_query(slots)
+            else:
+                query = build_template_query(slots, limit or default_limit)
+    if query:
+        logger.debug("Template match: %s", slots)
+        sql, params = query
+        return sql, params, "template", generation
+
+    sql, cached = await generate_sql(natural_language_query, catalog)
+    return sql, None, "sql_cache" if cached else "llm", generation
+
+
+async def answer_question(natural_language_query: str, cursor: str = None, page_size: int = None) -> dict:
+    """
+    Answers a question with rows from the companies database.
+
+    Questions that fit a template (see intent_matcher) run as bound-parameter
+    SQL without calling the LLM; everything else is translated by the LLM.
+
+    Args:
+        natural_language_query: The user's question.
+        cursor: Return the page after this CompanyNumber (see file_to_db.keyset_query).
+        page_size: Rows per page. Without it, the whole result is returned
+            in the query's own order.
+
+    Returns:
+        dict: 'result' (list of row dicts), 'sql', 'served_by', which is one of
+            'template', 'llm', 'sql_cache' or 'result_cache', and 'next_cursor',
+            set when another page may follow. On failure, 'error' replaces 'result'.
+    """
+    logger.debug("Processing query: %s", natural_language_query)
+    served_by = None
+    try:
+        # When paging, template results are only capped if the question asks for a limit.
+        default_limit = DEFAULT_LIMIT if page_size is None else None
+        sql, params, served_by, generation = await plan_question(natural_language_query, default_limit)
+        if page_size is not None:
+            with span("sql_plan"):
+                has_key = "CompanyNumber" in await run_in_executor(query_columns, sql, params)
+            if not has_key:
+                # Counts and other results without CompanyNumber come back in one piece.
+                page_size = None
+            elif keyset_pageable(sql):
+                sql, params = keyset_query(sql, params, after=cursor, limit=page_size)
+            elif cursor is not None:
+                return {"error": "This query keeps its own order and cannot be continued with a cursor.",
+                        "reason": "invalid_cursor", "served_by": served_by}
+            else:
+                # Ordered and top-N queries keep their order: the first page, and no cursor.
+                sql = prepare_select(sql, max_rows=page_size)
+                page_size = None
+
+        if isinstance(params, dict):
+            params_key = tuple(sorted(params.items()))
+        else:
+            params_key = tuple(params) if params else None
+        cache_key = (sql, params_key, generation)
+        result = result_cache.get(cache_key)
+        if result is None:
+            logger.debug("Executing SQL: %s", sql)
+            with span("sql"):
+                result = await fetch_rows_async(sql, params)
+            if result:
+                result_cache.set(cache_key, result)
         else:
-            print("No results found")
-            return [{"message": "No results found for your query."}]
-            
+            served_by = "result_cache"
+        ROWS_RETURNED.observe(len(result), served_by=served_by)
+
+        next_cursor = None
+        if page_size is not None and len(result) == page_size:
+            next_cursor = result[-1]["CompanyNumber"]
+        return {"result": result, "sql": sql, "served_by": served_by, "next_cursor": next_cursor}
+
+    except GuardError as e:
+        return rejected_answer(e, served_by)
     except Exception as e:
-        error_msg = f"Error in generate_and_run_sql_query: {str(e)}"
-        print(error_msg)
-        return {"error": error_msg}
+        error_msg = f"Error in answer_question: {str(e)}"
+        logger.exception("Error in answer_question")
+        ERRORS.inc(reason="error")
+        return {"error": error_msg, "served_by": served_by}
+
+
+@mcp.tool()
+async def generate_and_run_sql_query(natural_language_query: str):
+    """
+    Takes a natural language query, converts it to SQL using an LLM,
+    executes the SQL against the company database, and returns the result.
+    Common question shapes are answered from parameterized templates without the LLM.
+    """
+    answer = await answer_question(natural_language_query)
+    if "error" in answer:
+        return {"error": answer["error"], "reason": answer.get("reason")}
+
+    result = answer["result"]
+    if result:
+        return result
+    else:
+        return [{"message": "No results found for your query."}]
 
 def main():
     uvicorn.run(app, host="127.0.0.1", port=8000)
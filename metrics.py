@@ -0,0 +1,164 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; spans from a template hit (~1 ms) to a slow LLM round trip.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000, 10000, 100000)
+
+
+def configure_logging():
+    """Sets up logging from LOG_LEVEL (default WARNING, so the query path stays quiet)."""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base for metrics. With `collect`, a callable returning (labels dict, value)
+    pairs, the values are read from it at render time instead of being recorded.
+    """
+    type = None
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            if self.collect is not None:
+                self._values = {self._key(labels): value for labels, value in self.collect()}
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            series['counts'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+
+    def _render_series(self, key, series):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, {"le": le})} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {series["sum"]!r}')
+        lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        return '\n'.join(line for metric in self.metrics for line in metric.render()) + '\n'
+
+
+registry = Registry()
+REQUEST_SECONDS = registry.register(Histogram(
+    'search_request_seconds', 'End-to-end latency of search requests.', ['endpoint', 'served_by']))
+STAGE_SECONDS = registry.register(Histogram(
+    'search_stage_seconds', 'Latency of each stage of the search pipeline.', ['stage']))
+ROWS_RETURNED = registry.register(Histogram(
+    'search_rows_returned', 'Rows returned per search.', ['served_by'], buckets=ROW_BUCKETS))
+ERRORS = registry.register(Counter(
+    'search_errors_total', 'Searches that failed, by reason.', ['reason']))
+
+# Stages of the current request, in order, for the Server-Timing header.
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+def start_request():
+    """Starts collecting spans for the request running in the current context."""
+    spans = []
+    _request_spans.set(spans)
+    return spans
+
+
+@contextmanager
+def span(stage):
+    """
+    Times a pipeline stage. The duration goes to the search_stage_seconds
+    histogram and, inside a request, to its Server-Timing header.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, seconds))
+
+
+def server_timing(spans, total=None):
+    """Formats spans as a Server-Timing header value, e.g. 'llm;dur=812.4, sql;dur=3.1'."""
+    entries = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in spans]
+    if total is not None:
+        entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
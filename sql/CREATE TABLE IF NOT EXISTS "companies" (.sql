@@ -12,10 +12,10 @@ CREATE TABLE IF NOT EXISTS "companies" (
   "CompanyCategory" TEXT,
   "CompanyStatus" TEXT,
   "CountryOfOrigin" TEXT,
-  "DissolutionDate" REAL,
+  "DissolutionDate" TEXT,
   "IncorporationDate" TEXT,
-  "AccountsAccountRefDay" REAL,
-  "AccountsAccountRefMonth" REAL,
+  "AccountsAccountRefDay" INTEGER,
+  "AccountsAccountRefMonth" INTEGER,
   "AccountsNextDueDate" TEXT,
   "AccountsLastMadeUpDate" TEXT,
   "AccountsAccountCategory" TEXT,
@@ -55,11 +55,15 @@ CREATE TABLE IF NOT EXISTS "companies" (
   "ConfStmtNextDueDate" TEXT,
   "ConfStmtLastMadeUpDate" TEXT
 );
-CREATE INDEX idx_company_status ON companies (CompanyStatus);
-CREATE INDEX idx_accounts_category ON companies (AccountsAccountCategory);
-CREATE INDEX idx_reg_address_county ON companies (UPPER(RegAddressCounty));
+CREATE INDEX idx_company_status ON companies (CompanyStatus, CompanyNumber);
+CREATE INDEX idx_accounts_category ON companies (AccountsAccountCategory, CompanyNumber);
+CREATE INDEX idx_reg_address_county ON companies (UPPER(RegAddressCounty), CompanyNumber);
 CREATE INDEX idx_accounts_due_date ON companies (AccountsNextDueDate);
 CREATE INDEX idx_sic_code_1 ON companies (SICCodeSicText_1);
 CREATE INDEX idx_sic_code_2 ON companies (SICCodeSicText_2);
 CREATE INDEX idx_sic_code_3 ON companies (SICCodeSicText_3);
-CREATE INDEX idx_sic_code_4 ON companies (SICCodeSicText_4);
\ No newline at end of file
+CREATE INDEX idx_sic_code_4 ON companies (SICCodeSicText_4);
+CREATE INDEX idx_incorporation_date ON companies (IncorporationDate);
+CREATE INDEX idx_dissolution_date ON companies (DissolutionDate);
+CREATE INDEX idx_returns_due_date ON companies (ReturnsNextDueDate);
+CREATE INDEX idx_conf_stmt_due_date ON companies (ConfStmtNextDueDate);
\ No newline at end of file
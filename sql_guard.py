@@ -0,0 +1,215 @@
+import os
+import re
+import time
+import logging
+import sqlite3
+
+# Outer row cap for interactive queries and for NDJSON exports.
+MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 1000))
+EXPORT_MAX_ROWS = int(os.getenv("SQL_EXPORT_MAX_ROWS", 1000000))
+# Seconds of SQLite execution allowed per query, not counting time spent
+# waiting on the caller between fetches.
+TIME_BUDGET = float(os.getenv("SQL_TIME_BUDGET", 5))
+EXPORT_TIME_BUDGET = float(os.getenv("SQL_EXPORT_TIME_BUDGET", 300))
+# A plan step that scans a table with more rows than this is a full scan finding.
+MAX_SCAN_ROWS = int(os.getenv("SQL_MAX_SCAN_ROWS", 100000))
+# 'flag' logs full scans and lets the time budget stop them; 'reject' refuses them.
+SCAN_POLICY = os.getenv("SQL_SCAN_POLICY", "flag")
+# SQLite virtual machine instructions between two time budget checks.
+PROGRESS_INTERVAL = 1000
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\]|--[^\n]*|/\*.*?(?:\*/|$)|;""",
+                    re.DOTALL)
+_FIRST_WORD = re.compile(r'[\s(]*([A-Za-z]+)')
+# EXPLAIN QUERY PLAN detail of a table scan, e.g. 'SCAN companies', 'SCAN TABLE companies AS c',
+# 'SCAN c USING COVERING INDEX idx_company_status'.
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(?: USING (COVERING )?INDEX (\w+))?')
+_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)["`\]]?(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NOT_ALIAS = {'where', 'join', 'inner', 'left', 'right', 'cross', 'natural', 'on', 'using', 'group',
+              'order', 'limit', 'union', 'except', 'intersect', 'window', 'having', 'full', 'outer'}
+
+
+class GuardError(ValueError):
+    """
+    A query refused or stopped by the guard.
+
+    Attributes:
+        reason (str): Machine-readable cause: 'empty', 'multiple_statements',
+            'not_select', 'invalid_sql', 'full_scan' or 'time_budget'.
+        detail (dict): Extra context, such as the offending plan steps.
+    """
+
+    def __init__(self, reason, message, detail=None):
+        super().__init__(message)
+        self.reason = reason
+        self.detail = detail or {}
+
+    def as_dict(self):
+        return {'reason': self.reason, 'message': str(self), **self.detail}
+
+
+def split_statements(sql):
+    """
+    Splits SQL on the semicolons that end statements, ignoring any inside
+    string literals, quoted identifiers and comments.
+
+    Returns:
+        list[str]: The statements, without comments and with empty ones dropped.
+    """
+    statements, current, position = [], [], 0
+    for match in _TOKEN.finditer(sql):
+        current.append(sql[position:match.start()])
+        token = match.group()
+        if token == ';':
+            statements.append(''.join(current))
+            current = []
+        elif token.startswith('--') or token.startswith('/*'):
+            current.append(' ')
+        else:
+            current.append(token)
+        position = match.end()
+    current.append(sql[position:])
+    statements.append(''.join(current))
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def prepare_select(sql, max_rows=MAX_ROWS):
+    """
+    Checks that `sql` is a single SELECT statement and caps its result.
+
+    The cap is applied by wrapping the query, SELECT * FROM (sql) LIMIT n, so
+    it holds whatever LIMIT the query itself has or lacks.
+
+    Args:
+        sql (str): The query to check.
+        max_rows (int, optional): The row cap. No cap if None.
+
+    Returns:
+        str: The single statement, wrapped in the row cap.
+
+    Raises:
+        GuardError: If the SQL is empty, holds several statements or is not a SELECT.
+    """
+    statements = split_statements(sql)
+    if not statements:
+        raise GuardError('empty', "The query is empty.")
+    if len(statements) > 1:
+        raise GuardError('multiple_statements', "Only a single SQL statement is allowed.",
+                         {'statements': len(statements)})
+    statement = statements[0]
+    first_word = _FIRST_WORD.match(statement)
+    if not first_word or first_word.group(1).upper() not in ('SELECT', 'WITH'):
+        raise GuardError('not_select', "Only SELECT queries are allowed for security reasons.")
+    if max_rows is None:
+        return statement
+    return f"SELECT * FROM (\n{statement}\n) LIMIT {int(max_rows)}"
+
+
+def _table_rows(conn, table):
+    """Row estimate for `table` from ANALYZE statistics, else its largest rowid."""
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table,)).fetchone()
+        if row:
+            return int(row[0].split()[0])
+    except sqlite3.OperationalError:
+        pass  # no ANALYZE statistics yet
+    try:
+        return conn.execute(f'SELECT max(rowid) FROM "{table}"').fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0  # views, subqueries and tables without rowid
+
+
+def inspect_plan(conn, sql, params=None, max_scan_rows=MAX_SCAN_ROWS):
+    """
+    Runs EXPLAIN QUERY PLAN and reports full table scans over large tables.
+
+    A scan that walks a whole index (SCAN ... USING [COVERING] INDEX) reads
+    every row as well and is reported the same way; only SEARCH steps narrow
+    the rows read. Scans of virtual tables, subqueries and CTEs are not reported.
+
+    Returns:
+        list[dict]: One entry per offending plan step, with 'table', 'rows' and 'detail'.
+
+    Raises:
+        GuardError: With reason 'invalid_sql' if SQLite cannot compile the query.
+    """
+    try:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+    except sqlite3.Error as e:
+        raise GuardError('invalid_sql', f"Invalid SQL: {e}") from None
+
+    aliases = {}
+    for table, alias in _TABLE_ALIAS.findall(sql):
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in _NOT_ALIAS:
+            aliases[alias.lower()] = table
+
+    findings = []
+    for *_, detail in plan:
+        match = _SCAN.match(detail)
+        if not match or 'VIRTUAL TABLE' in detail:
+            continue
+        table = aliases.get(match.group(1).lower(), match.group(1))
+        rows = _table_rows(conn, table)
+        if rows > max_scan_rows:
+            findings.append({'table': table, 'rows': rows, 'detail': detail})
+    return findings
+
+
+def check_plan(conn, sql, params=None, max_scan_rows=MAX_SCAN_ROWS, policy=SCAN_POLICY):
+    """
+    Applies the full scan policy to a query before it runs.
+
+    Raises:
+        GuardError: With reason 'full_scan' if the policy is 'reject' and the
+            plan scans a table larger than `max_scan_rows`, or 'invalid_sql'.
+    """
+    findings = inspect_plan(conn, sql, params, max_scan_rows)
+    if findings and policy == 'reject':
+        raise GuardError('full_scan', "The query would scan too many rows; add a filter on an indexed column.",
+                         {'scans': findings})
+    for finding in findings:
+        logger.warning("Full scan of %s (%d rows): %s", finding['table'], finding['rows'], finding['detail'])
+    return findings
+
+
+class TimeBudget:
+    """
+    Limits the SQLite execution time of one query through a progress handler.
+
+    Use it as a context manager around each call into SQLite (execute, and
+    every fetch). Time accumulates across the calls, so time spent by the
+    caller between fetches does not count. Once the budget is spent SQLite
+    interrupts the running statement and a GuardError is raised.
+    """
+
+    def __init__(self, conn, seconds):
+        self.conn = conn
+        self.seconds = seconds
+        self.used = 0.0
+        self.interrupted = False
+        self._started = None
+
+    def _exceeded(self):
+        if self.used + time.monotonic() - self._started > self.seconds:
+            self.interrupted = True
+        return self.interrupted
+
+    def __enter__(self):
+        if self.seconds is not None:
+            self._started = time.monotonic()
+            self.conn.set_progress_handler(self._exceeded, PROGRESS_INTERVAL)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.seconds is None:
+            return False
+        self.conn.set_progress_handler(None, 0)
+        self.used += time.monotonic() - self._started
+        # Checked via the flag because callers such as pandas re-wrap the sqlite3 error.
+        if exc_type is not None and self.interrupted:
+            raise GuardError('time_budget', f"The query exceeded its {self.seconds:g}s time budget.",
+                             {'seconds': round(self.used, 3)}) from exc
+        return False
@@ -0,0 +1,26 @@
+import os
+from datetime import date
+
+import pytest
+
+from benchmarks.generate_companies import generate
+from file_to_db import bulk_load
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'test-key')
+
+
+@pytest.fixture(scope='session')
+def snapshot_csv(tmp_path_factory):
+    """A small synthetic snapshot, the same on every run."""
+    directory = tmp_path_factory.mktemp('snapshot')
+    [path] = generate(1000, str(directory / 'companies.csv'), seed=3, today=date(2024, 6, 1))
+    return path
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, snapshot_csv):
+    """A working directory holding companydata/companydata.db, imported from snapshot_csv."""
+    os.makedirs(tmp_path / 'companydata')
+    bulk_load([snapshot_csv], db_path=str(tmp_path / 'companydata' / 'companydata.db'))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+
+import pytest
+
+import db_pool
+from file_to_db import builds_dir, bulk_load, import_build
+
+DB_PATH = 'companydata/companydata.db'
+
+
+def _user_version(path):
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _row_count(path):
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM companies').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _builds():
+    return sorted(name for name in os.listdir(builds_dir(DB_PATH)) if name.endswith('.db'))
+
+
+@pytest.fixture
+def published(workdir, snapshot_csv):
+    """workdir with its database published as a build behind the companydata.db symlink."""
+    assert import_build(lambda path: bulk_load([snapshot_csv], path), DB_PATH)
+    return workdir
+
+
+def test_legacy_database_is_migrated(workdir, snapshot_csv):
+    assert not os.path.islink(DB_PATH)
+    generation, rows = _user_version(DB_PATH), _row_count(DB_PATH)
+
+    assert import_build(lambda path: bulk_load([snapshot_csv], path), DB_PATH)
+    assert os.path.islink(DB_PATH)
+    assert _user_version(DB_PATH) == generation + 1 and _row_count(DB_PATH) == rows
+    [legacy] = [name for name in _builds() if '-legacy-' in name]
+    assert _row_count(os.path.join(builds_dir(DB_PATH), legacy)) == rows
+    assert not os.path.exists(DB_PATH + '-wal') and not os.path.exists(DB_PATH + '-shm')
+
+
+def test_failed_validation_leaves_the_live_database_alone(published):
+    target, generation = os.path.realpath(DB_PATH), _user_version(DB_PATH)
+    builds = _builds()
+
+    def load(path):
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE companies (CompanyNumber TEXT PRIMARY KEY)')
+        conn.close()
+        return True
+
+    assert import_build(load, DB_PATH) is False
+    assert os.path.realpath(DB_PATH) == target and _user_version(DB_PATH) == generation
+    assert _builds() == builds
+
+
+def test_failed_load_leaves_the_live_database_alone(published):
+    target = os.path.realpath(DB_PATH)
+    builds = _builds()
+    assert not import_build(lambda path: False, DB_PATH)
+    assert os.path.realpath(DB_PATH) == target
+    assert _builds() == builds
+
+
+def test_publish_switches_pools_and_drains_the_old_one(published, snapshot_csv):
+    old_target, generation = os.path.realpath(DB_PATH), _user_version(DB_PATH)
+    old_pool = db_pool.get_pool(DB_PATH)
+    with old_pool.connection() as busy:
+        assert import_build(lambda path: bulk_load([snapshot_csv], path), DB_PATH)
+        new_target = os.path.realpath(DB_PATH)
+        assert new_target != old_target and _user_version(DB_PATH) == generation + 1
+
+        new_pool = db_pool.get_pool(DB_PATH)
+        assert new_pool is not old_pool and new_pool.db_path == new_target
+        with new_pool.connection() as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == generation + 1
+        # A query already holding a connection finishes on the old build.
+        assert busy.execute('PRAGMA user_version').fetchone()[0] == generation
+    with pytest.raises(sqlite3.ProgrammingError):
+        busy.execute('SELECT 1')
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+
+import pytest
+
+from db_pool import ConnectionPool
+
+
+def test_pool_does_not_create_a_missing_database(tmp_path):
+    path = tmp_path / 'companydata.db'
+    with pytest.raises(FileNotFoundError):
+        ConnectionPool(str(path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_pool_never_writes(tmp_path):
+    path = str(tmp_path / 'companydata.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (x)')
+    conn.execute('INSERT INTO t VALUES (1)')
+    conn.commit()
+    conn.close()
+
+    pool = ConnectionPool(path)
+    with pool.connection() as conn:
+        assert conn.execute('SELECT x FROM t').fetchall() == [(1,)]
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    pool.close()
+    assert sorted(os.listdir(tmp_path)) == ['companydata.db']
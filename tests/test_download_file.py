@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import download_file
+from download_file import download_file as fetch
+
+PAYLOAD = bytes(range(256)) * 40
+ETAG = '"v1"'
+
+
+@pytest.fixture
+def server():
+    """A stand-in file server supporting HEAD, Range/If-Range and If-None-Match."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _headers(self, status, length):
+            self.send_response(status)
+            self.send_header('ETag', ETAG)
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(length))
+            self.end_headers()
+
+        def do_HEAD(self):
+            requests.append(('HEAD', self.headers.get('If-None-Match')))
+            if self.headers.get('If-None-Match') == ETAG:
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self._headers(200, len(self.server.payload))
+
+        def do_GET(self):
+            match = re.fullmatch(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+            requests.append(('GET', self.headers.get('Range')))
+            if match and self.headers.get('If-Range', ETAG) == ETAG:
+                start, end = int(match.group(1)), int(match.group(2))
+                self._headers(206, end - start + 1)
+                self.wfile.write(self.server.payload[start:end + 1])
+            else:
+                self._headers(200, len(self.server.payload))
+                self.wfile.write(self.server.payload)
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.requests = requests
+    httpd.payload = PAYLOAD
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}/companies.csv"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(download_file, 'MIN_SEGMENT_SIZE', 1024)
+
+
+def test_download_in_range_segments(server, tmp_path):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        result = fetch(server.url, str(tmp_path), segments=4, segment_pool=pool)
+    assert open(result.path, 'rb').read() == PAYLOAD
+    assert result.bytes_downloaded == len(PAYLOAD) and not result.skipped
+    ranges = sorted(r for method, r in server.requests if method == 'GET')
+    assert ranges == ['bytes=0-2559', 'bytes=2560-5119', 'bytes=5120-7679', 'bytes=7680-10239']
+    assert sorted(os.listdir(tmp_path)) == ['companies.csv', 'companies.csv.meta.json']
+
+
+def test_partial_segments_resume(server, tmp_path):
+    # An interrupted run: segment 0 is 100 bytes in, segment 1 is done, 2 and 3 never started.
+    file_path = tmp_path / 'companies.csv'
+    (tmp_path / 'companies.csv.part0').write_bytes(PAYLOAD[:100])
+    (tmp_path / 'companies.csv.part1').write_bytes(PAYLOAD[2560:5120])
+    (tmp_path / 'companies.csv.meta.json').write_text(json.dumps(
+        {'url': server.url, 'etag': ETAG, 'last_modified': None, 'size': len(PAYLOAD),
+         'segments': 4, 'complete': False}))
+
+    result = fetch(server.url, str(tmp_path), segments=4)
+    assert file_path.read_bytes() == PAYLOAD
+    assert result.bytes_downloaded == len(PAYLOAD) - 100 - 2560
+    assert [r for method, r in server.requests if method == 'GET'] == [
+        'bytes=100-2559', 'bytes=5120-7679', 'bytes=7680-10239']
+
+
+def test_partial_segments_of_another_version_are_discarded(server, tmp_path):
+    (tmp_path / 'companies.csv.part0').write_bytes(b'x' * 100)
+    (tmp_path / 'companies.csv.meta.json').write_text(json.dumps(
+        {'url': server.url, 'etag': '"v0"', 'last_modified': None, 'size': len(PAYLOAD),
+         'segments': 4, 'complete': False}))
+
+    result = fetch(server.url, str(tmp_path), segments=4)
+    assert open(result.path, 'rb').read() == PAYLOAD
+    assert result.bytes_downloaded == len(PAYLOAD)
+
+
+def test_unchanged_file_is_skipped(server, tmp_path):
+    first = fetch(server.url, str(tmp_path), segments=4)
+    server.requests.clear()
+
+    second = fetch(server.url, str(tmp_path), segments=4)
+    assert second.skipped and second.path == first.path and second.bytes_downloaded == 0
+    assert server.requests == [('HEAD', ETAG)]
+
+
+def test_empty_file(server, tmp_path):
+    server.payload = b''
+    result = fetch(server.url, str(tmp_path), segments=4)
+    assert open(result.path, 'rb').read() == b'' and result.bytes_downloaded == 0
+    assert [method for method, _ in server.requests] == ['HEAD']
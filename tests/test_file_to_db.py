@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from file_to_db import (INDEXES, SCHEMA_PATH, SqlQuery, _quick_check, _rebuild_derived_table, build_aggregate_query, build_template_query,
+                        keyset_pageable, keyset_query, load_schema, query_companies_table)
+from sql_guard import prepare_select
+
+
+@pytest.mark.parametrize('sql, pageable', [
+    ("SELECT CompanyName, CompanyNumber FROM companies WHERE CompanyStatus = 'Active'", True),
+    ("SELECT * FROM companies c ORDER BY c.CompanyNumber LIMIT 20;", True),
+    ("SELECT * FROM companies WHERE CompanyName = 'ORDER BY x LIMIT 3'", True),
+    ("SELECT * FROM companies WHERE CompanyNumber IN (SELECT company_number FROM company_sic LIMIT 3)", True),
+    ("SELECT * FROM companies ORDER BY IncorporationDate LIMIT 20", False),
+    ("SELECT * FROM companies c WHERE c.AccountsNextDueDate > date('now') ORDER BY c.AccountsNextDueDate", False),
+    ("SELECT * FROM companies ORDER BY CompanyNumber DESC", False),
+    ("SELECT * FROM companies LIMIT 5", False),
+])
+def test_keyset_pageable(sql, pageable):
+    assert keyset_pageable(sql) is pageable
+
+
+def test_keyset_query_binds_cursor_and_page_size():
+    sql, params = keyset_query("SELECT CompanyNumber FROM companies WHERE CompanyStatus = :status",
+                               {'status': 'Active'}, after='00000010', limit=5)
+    assert sql.endswith("WHERE CompanyNumber > :_after ORDER BY CompanyNumber LIMIT :_page_size")
+    assert params == {'status': 'Active', '_after': '00000010', '_page_size': 5}
+
+
+def test_quick_check_ignores_false_null_reports_on_without_rowid_tables():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE company_sic (company_number TEXT NOT NULL, sic_code TEXT NOT NULL, '
+                 'position INTEGER NOT NULL, PRIMARY KEY (company_number, position)) WITHOUT ROWID')
+    conn.execute("INSERT INTO company_sic VALUES ('00000001', '43220', 1)")
+    assert _quick_check(conn) == []
+
+
+def test_quick_check_reports_real_nulls(tmp_path):
+    path = str(tmp_path / 'broken.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE z (a TEXT, b TEXT)')
+    conn.execute("INSERT INTO z VALUES (NULL, 'x')")
+    conn.commit()
+    # Tighten the declared schema behind SQLite's back, leaving the NULL in place.
+    conn.execute('PRAGMA writable_schema = 1')
+    conn.execute("UPDATE sqlite_master SET sql = 'CREATE TABLE z (a TEXT NOT NULL, b TEXT)' WHERE name = 'z'")
+    conn.commit()
+    conn.close()
+    assert _quick_check(sqlite3.connect(path)) == ['NULL value in z.a']
+
+
+@pytest.fixture
+def county_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(load_schema()[0])
+    conn.executemany("INSERT INTO companies (CompanyNumber, CompanyStatus, RegAddressCounty, RegAddressPostTown) "
+                     "VALUES (?, 'Active', ?, ?)",
+                     [('00000001', 'Essex', 'CHELMSFORD'), ('00000002', 'ESSEX', 'COLCHESTER'),
+                      ('00000003', 'Suffolk', 'IPSWICH'), ('00000004', 'SUFFOLK', 'ESSEX'), ('00000005', None, None)])
+    _rebuild_derived_table(conn, 'agg_company_counts')
+    return conn
+
+
+def test_county_breakdown_ignores_case(county_db):
+    sql, params = build_aggregate_query({'group_by': 'county'})
+    assert sorted(county_db.execute(sql, params).fetchall(), key=str) == [('ESSEX', 2), ('SUFFOLK', 2), (None, 1)]
+
+
+@pytest.mark.parametrize('county', ['Essex', 'suffolk'])
+def test_county_count_matches_list(county_db, county):
+    sql, params = build_aggregate_query({'county': county, 'aggregate': True})
+    count = county_db.execute(sql, params).fetchone()[0]
+    sql, params = build_template_query({'county': county}, limit=None)
+    assert count == len(county_db.execute(sql, params).fetchall()) == 2
+
+
+@pytest.mark.parametrize('query', list(SqlQuery), ids=lambda query: query.name)
+def test_canned_queries_are_selects(query):
+    prepare_select(query.value)
+
+
+def test_schema_query_lists_columns(workdir):
+    frame = query_companies_table(SqlQuery.SCHEMA.value, return_json=False)
+    assert list(frame.columns) == ['name', 'type']
+    assert ('CompanyNumber', 'TEXT') in set(frame.itertuples(index=False, name=None))
+
+
+def test_schema_file_declares_the_indexes():
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        declared = {line.rstrip(';') for line in f.read().splitlines() if line.startswith('CREATE INDEX')}
+    assert declared == {sql.replace(' IF NOT EXISTS', '').rstrip(';') for sql in INDEXES.values()}
@@ -0,0 +1,83 @@
+import csv
+import sqlite3
+from datetime import date
+
+import pytest
+
+from benchmarks.generate_companies import generate
+from file_to_db import DERIVED_TABLES, bulk_load, clean_column_name, incremental_load
+
+FTS_COLUMNS = ['CompanyName', 'PreviousNames', 'RegAddressAddressLine1', 'RegAddressAddressLine2',
+               'RegAddressPostTown', 'RegAddressCounty', 'RegAddressPostCode']
+
+
+def _write(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def snapshots(tmp_path_factory):
+    """Two monthly snapshots: the second drops, changes and adds companies."""
+    directory = tmp_path_factory.mktemp('snapshots')
+    [source] = generate(2500, str(directory / 'source.csv'), seed=7, today=date(2024, 6, 1))
+    with open(source, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    column = {clean_column_name(field): i for i, field in enumerate(header)}
+    # Values held only by removed companies must drop out of the summary tables.
+    for row in rows[:5]:
+        row[column['SICCodeSicText_1']] = '98765 - Removed activity'
+        row[column['RegAddressCounty']] = 'ATLANTIS'
+
+    changed = []
+    for n, row in enumerate(rows[300:2500]):
+        row = list(row)
+        if n % 7 == 0:
+            row[column['CompanyStatus']] = 'Liquidation'
+        if n % 11 == 0:
+            row[column['RegAddressCounty']] = row[column['RegAddressCounty']].lower()
+        if n % 13 == 0:
+            row[column['SICCodeSicText_1']] = '43220 - Plumbing, heat and air-conditioning installation'
+            row[column['CompanyName']] += ' PLUMBING'
+        if n % 17 == 0:
+            row[column['AccountsNextDueDate']] = '01/01/2030'
+        changed.append(row)
+    return _write(directory / 'old.csv', header, rows[:2000]), _write(directory / 'new.csv', header, changed)
+
+
+def _contents(path):
+    conn = sqlite3.connect(path)
+    tables = {'companies': conn.execute('SELECT * FROM companies ORDER BY CompanyNumber').fetchall()}
+    for name in DERIVED_TABLES:
+        # The FTS rowids differ between the builds; compare its rows by CompanyNumber.
+        if name == 'companies_fts':
+            sql = (f"SELECT c.CompanyNumber, {', '.join(f'f.{col}' for col in FTS_COLUMNS)} "
+                   "FROM companies_fts f JOIN companies c ON c.rowid = f.rowid")
+        else:
+            sql = f'SELECT * FROM {name}'
+        tables[name] = sorted(conn.execute(sql).fetchall(), key=repr)
+    tables['fts_rows'] = conn.execute('SELECT COUNT(*) FROM companies_fts').fetchone()
+    tables['plumbing'] = sorted(conn.execute(
+        "SELECT c.CompanyNumber FROM companies_fts f JOIN companies c ON c.rowid = f.rowid "
+        "WHERE companies_fts MATCH 'CompanyName : plumbing'").fetchall())
+    conn.close()
+    return tables
+
+
+def test_incremental_load_matches_full_rebuild(snapshots, tmp_path):
+    old, new = snapshots
+    incremental, full = str(tmp_path / 'incremental.db'), str(tmp_path / 'full.db')
+    bulk_load([old], db_path=incremental)
+    incremental_load([new], db_path=incremental)
+    bulk_load([new], db_path=full)
+
+    expected = _contents(full)
+    actual = _contents(incremental)
+    assert len(expected['companies']) == 2200 and expected['plumbing']
+    for name in expected:
+        assert actual[name] == expected[name], name
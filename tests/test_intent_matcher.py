@@ -0,0 +1,35 @@
+from intent_matcher import match_question
+
+CATALOG = {
+    'distinct_values': {
+        'CompanyStatus': ['Active', 'Liquidation', 'Dissolved'],
+        'AccountsAccountCategory': ['MICRO ENTITY', 'TOTAL EXEMPTION FULL', 'TOTAL EXEMPTION SMALL', 'DORMANT'],
+    },
+    'counties': ['ESSEX', 'SUFFOLK', 'GREATER LONDON'],
+    'sic_codes': {'43220': 'Plumbing, heat and air-conditioning installation'},
+}
+
+
+def test_total_exemption_category_is_a_list_not_a_count():
+    slots, limit = match_question("list total exemption full companies", CATALOG)
+    assert slots == {'accounts_category': 'TOTAL EXEMPTION FULL'}
+    assert limit is None
+
+
+def test_total_still_asks_for_a_count():
+    slots, _ = match_question("total active companies", CATALOG)
+    assert slots == {'status': 'Active', 'aggregate': True}
+
+
+def test_count_of_total_exemption_category():
+    slots, _ = match_question("how many total exemption small companies are there", CATALOG)
+    assert slots == {'accounts_category': 'TOTAL EXEMPTION SMALL', 'aggregate': True}
+
+
+def test_breakdown_by_county():
+    slots, _ = match_question("active companies by county", CATALOG)
+    assert slots == {'status': 'Active', 'group_by': 'county', 'aggregate': True}
+
+
+def test_unexplained_words_fall_through_to_the_llm():
+    assert match_question("active companies with more than ten directors", CATALOG) is None
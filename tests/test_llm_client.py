@@ -0,0 +1,147 @@
+import time
+import socket
+import asyncio
+import threading
+from contextlib import contextmanager
+
+import pytest
+import uvicorn
+from anthropic import APIConnectionError, APIStatusError
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+import llm_client
+from benchmarks.fake_llm import create_app
+from llm_client import LLMClient
+
+OVERLOADED = {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}}
+
+
+def _message(text):
+    return {'id': 'msg_test', 'type': 'message', 'role': 'assistant', 'model': 'fake',
+            'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn',
+            'stop_sequence': None, 'usage': {'input_tokens': 0, 'output_tokens': 0}}
+
+
+@contextmanager
+def serve(app):
+    """Runs `app` under uvicorn on a free local port and yields its base URL."""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level='warning'))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        thread.join()
+        sock.close()
+
+
+def stub_model(respond):
+    """A Messages API stand-in: `respond(attempt)` returns a JSONResponse or reply text."""
+    app = FastAPI()
+    app.state.attempts = 0
+
+    @app.post("/v1/messages")
+    async def messages():
+        app.state.attempts += 1
+        reply = await respond(app.state.attempts)
+        return reply if isinstance(reply, JSONResponse) else _message(reply)
+
+    return app
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, '_retry_delay', lambda attempt, retry_after=None: 0)
+
+
+def test_identical_questions_share_one_call():
+    fake = create_app(latency=0.2)
+    with serve(fake) as url:
+        client = LLMClient('test-key', base_url=url)
+
+        async def ask():
+            return await asyncio.gather(*(client.complete('system', 'dissolved companies') for _ in range(5)))
+
+        answers = asyncio.run(ask())
+    assert len(set(answers)) == 1 and 'DissolutionDate' in answers[0]
+    assert fake.state.calls == 1
+    assert client.stats()['coalesced'] == 4 and client.stats()['calls'] == 1
+
+
+def test_overloaded_responses_are_retried():
+    async def respond(attempt):
+        return JSONResponse(OVERLOADED, status_code=529) if attempt <= 2 else 'SELECT 1'
+
+    app = stub_model(respond)
+    with serve(app) as url:
+        client = LLMClient('test-key', base_url=url, max_retries=3)
+        assert asyncio.run(client.complete('system', 'question')) == 'SELECT 1'
+    assert app.state.attempts == 3 and client.stats()['retries'] == 2
+
+
+def test_retries_stop_at_max_retries():
+    async def respond(attempt):
+        return JSONResponse(OVERLOADED, status_code=529)
+
+    app = stub_model(respond)
+    with serve(app) as url:
+        client = LLMClient('test-key', base_url=url, max_retries=2)
+        with pytest.raises(APIStatusError):
+            asyncio.run(client.complete('system', 'question'))
+    assert app.state.attempts == 3 and client.stats()['failures'] == 1
+
+
+def test_client_errors_are_not_retried():
+    async def respond(attempt):
+        return JSONResponse({'type': 'error', 'error': {'type': 'invalid_request_error', 'message': 'Bad'}},
+                            status_code=400)
+
+    app = stub_model(respond)
+    with serve(app) as url:
+        client = LLMClient('test-key', base_url=url, max_retries=3)
+        with pytest.raises(APIStatusError):
+            asyncio.run(client.complete('system', 'question'))
+    assert app.state.attempts == 1
+
+
+def test_connection_errors_are_retried():
+    # Bound but never listening, so every connection is refused.
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        client = LLMClient('test-key', base_url=f"http://127.0.0.1:{sock.getsockname()[1]}", max_retries=2)
+        with pytest.raises(APIConnectionError):
+            asyncio.run(client.complete('system', 'question'))
+    assert client.stats()['calls'] == 3 and client.stats()['retries'] == 2
+
+
+def test_concurrency_is_capped():
+    running, peak = [0], [0]
+
+    async def respond(attempt):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.1)
+        running[0] -= 1
+        return 'SELECT 1'
+
+    with serve(stub_model(respond)) as url:
+        client = LLMClient('test-key', base_url=url, concurrency=2)
+        observed = []
+
+        async def ask():
+            calls = asyncio.gather(*(client.complete('system', f'question {n}') for n in range(6)))
+            while not calls.done():
+                observed.append((client.active, client.waiting))
+                await asyncio.sleep(0.01)
+            return await calls
+
+        assert asyncio.run(ask()) == ['SELECT 1'] * 6
+    assert peak[0] == 2 and max(active for active, _ in observed) == 2
+    assert max(waiting for _, waiting in observed) > 0
+    assert client.stats()['active'] == 0 and client.stats()['calls'] == 6
@@ -0,0 +1,95 @@
+import json
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import mcp_server
+from metrics import ERRORS, ROWS_RETURNED
+
+# What the model answers for a list question with no order or count of its own.
+LLM_SQL = "SELECT CompanyName, CompanyNumber, CompanyStatus FROM companies WHERE CompanyStatus = 'Active'"
+QUESTION = "which firms are still trading"
+
+
+@pytest.fixture
+def server(workdir, monkeypatch):
+    """The search endpoint on workdir's database, with the model stubbed out."""
+    calls = []
+
+    async def complete(system, prompt, key=None, max_tokens=500):
+        calls.append(prompt)
+        return client.answers.pop(0) if client.answers else LLM_SQL
+
+    monkeypatch.setattr(mcp_server.llm, 'complete', complete)
+    mcp_server.sql_cache.clear()
+    mcp_server.result_cache.clear()
+    client = TestClient(mcp_server.app, headers={'X-API-Key': mcp_server.anthropic_api_key})
+    client.calls = calls
+    client.answers = []
+    return client
+
+
+def _active_numbers(workdir):
+    conn = sqlite3.connect(workdir / 'companydata' / 'companydata.db')
+    numbers = [n for n, in conn.execute("SELECT CompanyNumber FROM companies WHERE CompanyStatus = 'Active' "
+                                        "ORDER BY CompanyNumber")]
+    conn.close()
+    return numbers
+
+
+def test_prompt_leaves_order_and_limit_to_the_question():
+    prompt = mcp_server.build_system_prompt({'columns': [('CompanyNumber', 'TEXT')]})
+    assert 'Default to LIMIT' not in prompt and 'Only add ORDER BY' in prompt
+
+
+def test_llm_query_pages_with_a_cursor(server, workdir):
+    numbers, cursor, pages = [], None, 0
+    while True:
+        params = {'query': QUESTION, 'limit': 150, **({'cursor': cursor} if cursor else {})}
+        body = server.get('/api/companies/search', params=params).json()
+        assert body['served_by'] in ('llm', 'sql_cache')
+        numbers += [row['CompanyNumber'] for row in body['result']]
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert numbers == _active_numbers(workdir)
+    assert pages > 1 and len(server.calls) == 1
+
+
+def test_llm_query_streams_every_row(server, workdir):
+    response = server.get('/api/companies/search', params={'query': QUESTION, 'stream': 'true'})
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['CompanyNumber'] for row in rows] == _active_numbers(workdir)
+
+
+def test_sql_that_does_not_compile_is_not_cached(server):
+    server.answers.append("SELECT CompanyName, NoSuchColumn FROM companies")
+    first = server.get('/api/companies/search', params={'query': QUESTION}).json()
+    assert first['result']['reason'] == 'invalid_sql'
+
+    second = server.get('/api/companies/search', params={'query': QUESTION}).json()
+    assert second['served_by'] == 'llm' and len(second['result']) == 5
+    assert len(server.calls) == 2
+
+
+def _rows_returned(served_by):
+    series = ROWS_RETURNED._values.get((served_by,))
+    return (sum(series['counts']), series['sum']) if series else (0, 0.0)
+
+
+def test_streams_record_rows_returned(server, workdir):
+    streams, rows = _rows_returned('llm')
+    server.get('/api/companies/search', params={'query': QUESTION, 'stream': 'true'})
+    assert _rows_returned('llm') == (streams + 1, rows + len(_active_numbers(workdir)))
+
+
+def test_stream_failures_record_their_reason(server, monkeypatch):
+    monkeypatch.setattr(mcp_server, 'EXPORT_TIME_BUDGET', 0)
+    before = ERRORS._values.get(('time_budget',), 0)
+    server.answers.append("SELECT a.CompanyNumber FROM companies a, companies b, companies c")
+    response = server.get('/api/companies/search', params={'query': QUESTION, 'stream': 'true'})
+    assert json.loads(response.text.splitlines()[-1])['reason'] == 'time_budget'
+    assert ERRORS._values.get(('time_budget',), 0) == before + 1
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+from sql_guard import GuardError, check_plan, inspect_plan, prepare_select, split_statements
+
+
+@pytest.mark.parametrize('sql, statements', [
+    ("SELECT 1; ", ["SELECT 1"]),
+    ("SELECT 1; SELECT 2", ["SELECT 1", "SELECT 2"]),
+    ("SELECT ';' AS a, \"x;y\" FROM t", ["SELECT ';' AS a, \"x;y\" FROM t"]),
+    ("SELECT 'it''s; fine'", ["SELECT 'it''s; fine'"]),
+    ("SELECT 1 -- trailing; comment\n", ["SELECT 1"]),
+    ("/* a; b */ SELECT 1;;", ["SELECT 1"]),
+    ("  ;  ", []),
+])
+def test_split_statements(sql, statements):
+    assert split_statements(sql) == statements
+
+
+def test_prepare_select_caps_rows():
+    sql = prepare_select("SELECT * FROM companies LIMIT 5000;", max_rows=10)
+    assert sql == "SELECT * FROM (\nSELECT * FROM companies LIMIT 5000\n) LIMIT 10"
+    assert prepare_select("WITH a AS (SELECT 1) SELECT * FROM a", max_rows=None) == "WITH a AS (SELECT 1) SELECT * FROM a"
+
+
+@pytest.mark.parametrize('sql, reason', [
+    ("", 'empty'),
+    ("-- nothing", 'empty'),
+    ("SELECT 1; DROP TABLE companies", 'multiple_statements'),
+    ("DELETE FROM companies", 'not_select'),
+    ("PRAGMA writable_schema = 1", 'not_select'),
+    ("/* SELECT */ UPDATE companies SET CompanyName = 'x'", 'not_select'),
+])
+def test_prepare_select_rejects(sql, reason):
+    with pytest.raises(GuardError) as error:
+        prepare_select(sql)
+    assert error.value.reason == reason
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE companies (CompanyNumber TEXT PRIMARY KEY, CompanyName TEXT, CompanyStatus TEXT)')
+    conn.execute('CREATE INDEX idx_company_status ON companies (CompanyStatus, CompanyNumber)')
+    conn.executemany('INSERT INTO companies VALUES (?, ?, ?)',
+                     [(f'{n:08d}', f'COMPANY {n}', 'Active' if n % 10 else 'Liquidation') for n in range(1, 1001)])
+    yield conn
+    conn.close()
+
+
+def test_table_scan_is_reported(conn):
+    findings = inspect_plan(conn, "SELECT * FROM companies WHERE CompanyName = 'X'", max_scan_rows=100)
+    assert [finding['table'] for finding in findings] == ['companies']
+
+
+def test_full_index_walk_is_reported(conn):
+    findings = inspect_plan(conn, "SELECT CompanyNumber FROM companies c ORDER BY c.CompanyNumber", max_scan_rows=100)
+    assert len(findings) == 1
+    assert 'USING' in findings[0]['detail'] and findings[0]['table'] == 'companies'
+
+
+def test_index_search_is_not_reported(conn):
+    sql = "SELECT * FROM companies WHERE CompanyStatus = 'Liquidation' AND CompanyNumber > '00000100'"
+    assert inspect_plan(conn, sql, max_scan_rows=100) == []
+
+
+def test_reject_policy_refuses_index_walk(conn):
+    with pytest.raises(GuardError) as error:
+        check_plan(conn, "SELECT CompanyNumber FROM companies ORDER BY CompanyNumber", max_scan_rows=100,
+                   policy='reject')
+    assert error.value.reason == 'full_scan'